@@ -2,10 +2,16 @@ from .idiokit import (
     __version__,
     stream,
     next,
+    next_batch,
     send,
+    send_many,
     pipe,
     map,
     consume,
+    buffer,
+    parallel_map,
+    window,
+    watch_signals,
     stop,
     main_loop,
     Event,
@@ -15,16 +21,23 @@ from .idiokit import (
 )
 from .timer import sleep
 from .threadpool import thread
+from .processpool import process
 
 
 __all__ = [
     "__version__",
     "stream",
     "next",
+    "next_batch",
     "send",
+    "send_many",
     "pipe",
     "map",
     "consume",
+    "buffer",
+    "parallel_map",
+    "window",
+    "watch_signals",
     "stop",
     "main_loop",
     "Event",
@@ -32,5 +45,6 @@ __all__ = [
     "Signal",
     "BrokenPipe",
     "sleep",
-    "thread"
+    "thread",
+    "process"
 ]
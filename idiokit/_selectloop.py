@@ -1,56 +1,358 @@
 from __future__ import absolute_import
 
 import os
+import sys
+import fcntl
+import math
 import errno
+import thread
 import select
+import ctypes
+import signal
+import struct
+import operator
 import threading
 import collections
 
-from . import heap, _time
+from . import heap, wheel, _time
+
+
+DEFAULT_RESOLUTION = 0.001
+
+
+EFD_CLOEXEC = 0o2000000
+
+
+def _load_eventfd():
+    if not sys.platform.startswith("linux"):
+        return None
+
+    try:
+        eventfd = _time.load_lib("c", use_errno=True).eventfd
+    except (OSError, AttributeError):
+        return None
+
+    eventfd.restype = ctypes.c_int
+    eventfd.argtypes = [ctypes.c_uint, ctypes.c_int]
+    return eventfd
+
+
+_eventfd = _load_eventfd()
+
+
+def _open_eventfd():
+    fd = _eventfd(0, EFD_CLOEXEC)
+    if fd == -1:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error))
+    return fd
+
+
+_timestamp = operator.itemgetter(0)
+
+
+IterationStats = collections.namedtuple("IterationStats", [
+    "callbacks",
+    "wait_time",
+    "run_time",
+    "timers",
+    "fds",
+    "remote_calls",
+    "deferred"
+])
 
 
 class SelectLoop(object):
     _INFINITY = float("inf")
+    _ceil = staticmethod(math.ceil)
     _EINTR = errno.EINTR
+    _EAGAIN = errno.EAGAIN
 
     _read = os.read
     _write = os.write
     _monotonic = _time.monotonic
+    _get_ident = staticmethod(thread.get_ident)
     _native_select = select.select
     _select_error = select.error
     _HeapError = heap.HeapError
+    _WheelError = wheel.WheelError
+    _WheelNode = wheel._Node
     _AttributeError = AttributeError
     _OSError = OSError
     _BaseException = BaseException
 
-    def __init__(self):
+    def __init__(self, resolution=DEFAULT_RESOLUTION, wakeup=None, budget=None):
         self._lock = threading.Lock()
-        self._rfd, self._wfd = os.pipe()
         self._pending = False
 
+        # The loop wakes itself up through an eventfd counter when the
+        # platform has one, and through a pipe otherwise. An eventfd is
+        # both ends at once and takes 8 byte integers instead of bytes.
+        if wakeup is None:
+            wakeup = "pipe" if _eventfd is None else "eventfd"
+        if wakeup == "eventfd":
+            self._rfd = self._wfd = _open_eventfd()
+            self._wake_data = struct.pack("=Q", 1)
+        elif wakeup == "pipe":
+            self._rfd, self._wfd = os.pipe()
+            self._wake_data = "\x00"
+        else:
+            raise ValueError("unknown wakeup mechanism {0!r}".format(wakeup))
+        self._wake_size = len(self._wake_data)
+
         self._reads = {}
         self._writes = {}
         self._excepts = {}
+        self._fds = None
 
-        self._heap = heap.Heap()
+        # Finite timeouts go to a timing wheel with O(1) push and cancel
+        # when a resolution is given, the rest (zero timeouts, waits without
+        # a timeout and timeouts beyond the wheel's horizon) to the heap.
+        self._now = self._monotonic()
+        self._heap = heap.LazyHeap()
+        self._wheel = wheel.Wheel(resolution, self._now) if resolution else None
+        self._wakeup = -self._INFINITY
         self._nodes = collections.defaultdict(lambda: ([], [], []))
 
         self._immediate = collections.deque()
         self._calls = collections.deque()
         self._local = threading.local()
 
+        # The callbacks left over when an iteration runs out of its budget.
+        # They are run first in the next iteration, before the callbacks
+        # of its I/O events and timers.
+        self._budget = None
+        self._deferred = None
+        self.set_budget(budget)
+
+        # Calls delivered from other threads. Appending to a deque is
+        # atomic, so delivering only takes the lock to wake up the loop
+        # for the first call of each batch.
+        self._deliveries = collections.deque()
+        self._delivery_pending = False
+
+        # Signals caught by the Python level handler, waiting to be
+        # dispatched. The C level handler wakes up the loop by writing
+        # to a pipe of its own (see signal.set_wakeup_fd).
+        self._signals = collections.deque()
+        self._signal_callbacks = {}
+        self._signal_previous = {}
+        self._signal_pipe = None
+        self._signal_node = None
+        self._previous_wakeup_fd = -1
+
+        self._owner = None
+        self._remote_calls = 0
+        self._stats_hooks = ()
+
+        self._trackers = 0
+        self._sequence = 0
+        self._active = None
+
+    def now(self):
+        """
+        Return the loop's idea of the current monotonic time. The value is
+        read from the clock when the loop wakes up, and stays the same for
+        all callbacks run during that iteration. Use update_now() when a
+        more precise value is needed.
+        """
+
+        return self._now
+
+    def update_now(self):
+        self._now = now = self._monotonic()
+        return now
+
+    def set_budget(self, budget):
+        """
+        Run at most budget callbacks per iteration, or any number of them
+        when budget is None. Callbacks beyond the budget, including the
+        ones they schedule with asap, are deferred to the next iteration.
+        There they run first, followed by the callbacks of the I/O events
+        and expired timers noticed in between, so that a busy chain of
+        callbacks can't keep the loop from noticing I/O and timers while
+        the callbacks still run in FIFO order and none of them waits
+        forever. The number of deferred callbacks is reported in the
+        "deferred" field of the iteration stats.
+        """
+
+        if budget is not None and budget < 1:
+            raise ValueError("budget must be at least 1")
+        self._budget = self._INFINITY if budget is None else budget
+
+    def add_signal_handler(self, signum, callback):
+        """
+        Call callback(signum) from the loop each time the signal is caught.
+        Many callbacks can be added for the same signal. The process-wide
+        signal handler gets installed when the first callback for the
+        signal is added and restored when the last one is removed, so this
+        has to be called from the main thread.
+        """
+
+        callbacks = self._signal_callbacks.get(signum, None)
+        if callbacks is None:
+            first = not self._signal_callbacks
+            if first:
+                self._open_signal_pipe()
+
+            try:
+                self._signal_previous[signum] = signal.signal(signum, self._catch_signal)
+            except:
+                if first:
+                    self._close_signal_pipe()
+                raise
+            callbacks = self._signal_callbacks[signum] = []
+        callbacks.append(callback)
+
+    def remove_signal_handler(self, signum, callback):
+        callbacks = self._signal_callbacks[signum]
+        callbacks.remove(callback)
+        if callbacks:
+            return
+
+        del self._signal_callbacks[signum]
+        signal.signal(signum, self._signal_previous.pop(signum))
+        if not self._signal_callbacks:
+            self._close_signal_pipe()
+
+    def _open_signal_pipe(self):
+        rfd, wfd = os.pipe()
+        try:
+            for fd in (rfd, wfd):
+                flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+                fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+            # Raises ValueError when not called from the main thread.
+            self._previous_wakeup_fd = signal.set_wakeup_fd(wfd)
+        except:
+            os.close(rfd)
+            os.close(wfd)
+            raise
+
+        pipe = self._signal_pipe = rfd, wfd
+        self._signal_node = self.wait((rfd,), (), (), None, self._dispatch_signals, pipe)
+
+    def _close_signal_pipe(self):
+        signal.set_wakeup_fd(self._previous_wakeup_fd)
+        self._previous_wakeup_fd = -1
+
+        self.cancel(self._signal_node)
+        self._signal_node = None
+
+        rfd, wfd = self._signal_pipe
+        self._signal_pipe = None
+        os.close(rfd)
+        os.close(wfd)
+
+        # Forget the signals caught but not yet dispatched, so that they
+        # don't get dispatched to handlers added later on.
+        self._signals.clear()
+
+    def _catch_signal(self, signum, _):
+        # Python runs this in the main thread between two bytecodes, maybe
+        # while the loop's lock is being held, so just record the signal.
+        self._signals.append(signum)
+
+    def _dispatch_signals(self, has_errors, rfds, wfds, xfds, pipe):
+        # Skip calls left over from a pipe that has been closed already.
+        if pipe is not self._signal_pipe:
+            return
+
+        rfd, _ = pipe
+        self._signal_node = self.wait((rfd,), (), (), None, self._dispatch_signals, pipe)
+
+        # Empty the pipe before the deque: The Python level handler of a
+        # signal has always been run by the time its byte has been read.
+        while True:
+            try:
+                if not self._read(rfd, 4096):
+                    break
+            except self._OSError as ose:
+                if ose.errno == self._EINTR:
+                    continue
+                if ose.errno == self._EAGAIN:
+                    break
+                raise ose
+
+        signals = self._signals
+        while signals:
+            signum = signals.popleft()
+            for callback in tuple(self._signal_callbacks.get(signum, ())):
+                callback(signum)
+
+    def add_stats_hook(self, hook):
+        """
+        Call hook(stats) after each iteration of the loop with an
+        IterationStats instance. Timing is only measured while there are
+        hooks registered.
+        """
+
+        self._stats_hooks = self._stats_hooks + (hook,)
+
+    def remove_stats_hook(self, hook):
+        hooks = list(self._stats_hooks)
+        hooks.remove(hook)
+        self._stats_hooks = tuple(hooks)
+
+    def enable_call_tracking(self):
+        """
+        Start publishing the callback that is currently being run through
+        active_call(). Each enable_call_tracking() call should be paired
+        with a disable_call_tracking() call.
+        """
+
+        with self._lock:
+            self._trackers += 1
+
+    def disable_call_tracking(self):
+        with self._lock:
+            self._trackers -= 1
+
+    def thread_ident(self):
+        """
+        Return the ident of the thread that has been running the loop, or
+        None if the loop has not been iterated yet.
+        """
+
+        return self._owner
+
+    def active_call(self):
+        """
+        Return a (sequence number, thread ident, callback, args) tuple for
+        the callback the loop is running right now, or None when the loop
+        is not running callbacks (or call tracking is not enabled). Safe to
+        call from other threads.
+        """
+
+        return self._active
+
     def select(self, rfds, wfds, xfds, timeout, callback, *args, **keys):
         # Check the fast path: Would the select return immediately?
-        has_errors, outr, outw, outx = self._select(rfds, wfds, xfds, 0.0)
+        has_errors, outr, outw, outx = self._probe(rfds, wfds, xfds)
         if has_errors or outr or outw or outx:
-            return asap(callback, has_errors, outr, outw, outx, *args, **keys)
+            return self.asap(callback, has_errors, outr, outw, outx, *args, **keys)
+        return self.wait(rfds, wfds, xfds, timeout, callback, *args, **keys)
 
+    def wait(self, rfds, wfds, xfds, timeout, callback, *args, **keys):
+        # Like select, but skip the fast path check. Meant for callers that
+        # already know the descriptors are not ready, e.g. because the
+        # operation they just tried failed with EAGAIN.
         types = tuple(rfds), tuple(wfds), tuple(xfds)
         return self._select_add(types, timeout, callback, args, keys)
 
     def sleep(self, timeout, callback, *args, **keys):
         return self._select_add(None, timeout, callback, args, keys)
 
+    def sleep_with_slack(self, timeout, slack, callback, *args, **keys):
+        """
+        Like sleep(...), but allow the callback to be run up to slack
+        seconds late. The deadline is rounded up to the next multiple of
+        slack, so that nearby timers with the same slack share a deadline
+        and get run during the same wakeup.
+        """
+
+        return self._select_add(None, timeout, callback, args, keys, slack)
+
     def asap(self, callback, *args, **keys):
         try:
             current = self._local.current
@@ -63,6 +365,48 @@ class SelectLoop(object):
         current.append((callback, args, keys))
         return None
 
+    def deliver(self, callback, *args, **keys):
+        """
+        Like asap(...), but meant for calls coming from other threads. The
+        calls are queued without taking the loop's lock and run in one
+        batch during the next iteration, and only the first call of each
+        batch wakes up the loop. The call can not be cancelled.
+        """
+
+        self._deliveries.append((callback, args, keys))
+        if not self._delivery_pending:
+            self._delivery_pending = True
+            with self._lock:
+                if not self._pending:
+                    self._write(self._wfd, self._wake_data)
+                    self._pending = True
+
+    def closing(self, fd):
+        """
+        Wake up the waiters of a file object or descriptor that is about to
+        be closed, reporting an error to them like select.select would do
+        for a closed descriptor. Call this before closing anything that may
+        have waiters: e.g. the epoll backend can't notice the close, as the
+        kernel silently drops closed descriptors from the epoll set.
+        """
+
+        nodes = collections.defaultdict(lambda: ([], [], []))
+
+        with self._lock:
+            for index, target in enumerate((self._reads, self._writes, self._excepts)):
+                for node in target.get(fd, ()):
+                    nodes[node][index].append(fd)
+            if not nodes:
+                return
+
+            for node, (rfds, wfds, xfds) in nodes.iteritems():
+                func, args, keys = self._pop_node(node)
+                self._immediate.append((func, (True, rfds, wfds, xfds) + args, keys))
+
+            if not self._pending:
+                self._write(self._wfd, self._wake_data)
+                self._pending = True
+
     def cancel(self, node):
         if node is None:
             return
@@ -70,23 +414,48 @@ class SelectLoop(object):
         try:
             with self._lock:
                 self._pop_node(node)
-        except self._HeapError:
+        except (self._HeapError, self._WheelError):
             return False
         return True
 
-    def _select_add(self, types, timeout, callback, args, keys):
+    def _select_add(self, types, timeout, callback, args, keys, slack=0.0):
+        now = None
         if timeout is None:
             timestamp = self._INFINITY
         elif timeout <= 0.0:
             timestamp = 0.0
         else:
-            timestamp = self._monotonic() + timeout
+            # Timeouts set by the loop's callbacks are relative to the loop
+            # time cached for the current iteration. Outside the callbacks
+            # (other threads, or the owner thread between iterations) the
+            # cached time may be stale, so read the clock.
+            try:
+                current = self._local.current
+            except self._AttributeError:
+                current = None
+
+            if current is None:
+                now = self._monotonic()
+            else:
+                now = self._now
+            timestamp = now + timeout
+            if slack > 0.0:
+                timestamp = self._ceil(timestamp / slack) * slack
 
         with self._lock:
+            wheel = self._wheel
             if types is None and timestamp == 0.0:
                 self._immediate.append((callback, args, keys))
                 node = None
                 should_wake = True
+
+                if self._get_ident() != self._owner:
+                    self._remote_calls += 1
+            elif now is not None and wheel is not None and wheel.fits(timestamp):
+                if not wheel:
+                    wheel.advance(now)
+                node = wheel.push(timestamp, (timestamp, types, callback, args, keys))
+                should_wake = timestamp < self._wakeup
             else:
                 node = self._heap.push((timestamp, types, callback, args, keys))
                 should_wake = node is self._heap.head()
@@ -98,7 +467,7 @@ class SelectLoop(object):
                 should_wake = self._select_add_type(node, xfds, self._excepts) or should_wake
 
             if should_wake and not self._pending:
-                self._write(self._wfd, "\x00")
+                self._write(self._wfd, self._wake_data)
                 self._pending = True
         return node
 
@@ -109,48 +478,68 @@ class SelectLoop(object):
             if fd not in target:
                 should_wake = True
                 target[fd] = set()
+                self._watch(fd)
             target[fd].add(node)
 
         return should_wake
 
     def _pop_node(self, node):
-        _, types, func, args, keys = self._heap.pop(node)
+        if isinstance(node, self._WheelNode):
+            _, types, func, args, keys = self._wheel.pop(node)
+        else:
+            _, types, func, args, keys = self._heap.pop(node)
 
         if types is not None:
-            rfds, wfds, xfds = types
-            self._pop_type(node, rfds, self._reads)
-            self._pop_type(node, wfds, self._writes)
-            self._pop_type(node, xfds, self._excepts)
-
+            self._pop_types(node, types)
         return func, args, keys
 
+    def _pop_types(self, node, types):
+        rfds, wfds, xfds = types
+        self._pop_type(node, rfds, self._reads)
+        self._pop_type(node, wfds, self._writes)
+        self._pop_type(node, xfds, self._excepts)
+
     def _pop_type(self, node, fds, target):
         for fd in fds:
             nodes = target[fd]
             nodes.discard(node)
             if not nodes:
                 del target[fd]
+                self._watch(fd)
+
+    def _watch(self, fd):
+        # Called with the lock held whenever fd gets added to or removed
+        # from one of the interest tables. The select.select argument lists
+        # are rebuilt lazily only after such changes.
+        self._fds = None
 
     def _prepare(self):
         with self._lock:
-            rfds = self._reads.keys()
-            wfds = self._writes.keys()
-            xfds = self._excepts.keys()
-
             timeout = None
 
-            if self._immediate:
+            if self._immediate or self._deliveries or self._deferred:
                 timeout = 0.0
-            elif self._heap:
-                timestamp = self._heap.peek()[0]
+            elif self._heap or self._wheel:
+                timestamp = self._INFINITY
+                if self._heap:
+                    timestamp = self._heap.peek()[0]
+                if self._wheel:
+                    timestamp = min(timestamp, self._wheel.next_timestamp())
                 if timestamp < self._INFINITY:
-                    timeout = max(0.0, timestamp - self._monotonic())
+                    timeout = max(0.0, timestamp - self.update_now())
+
+            # Record when the loop is going to wake up on its own, so that
+            # timers added from other threads know whether to wake it up.
+            if timeout is None:
+                self._wakeup = self._INFINITY
+            elif timeout > 0.0:
+                self._wakeup = timestamp
 
             if timeout != 0.0:
                 if self._pending:
                     while True:
                         try:
-                            self._read(self._rfd, 1)
+                            self._read(self._rfd, self._wake_size)
                         except self._OSError as ose:
                             if ose.errno != self._EINTR:
                                 raise ose
@@ -158,8 +547,26 @@ class SelectLoop(object):
                             break
 
                     self._pending = False
-                rfds.append(self._rfd)
-        return rfds, wfds, xfds, timeout
+            fds = self._snapshot()
+        return fds, timeout
+
+    def _snapshot(self):
+        fds = self._fds
+        if fds is None:
+            rfds = self._reads.keys()
+            rfds.append(self._rfd)
+            fds = rfds, self._writes.keys(), self._excepts.keys()
+            self._fds = fds
+        return fds
+
+    def _wait(self, fds, timeout):
+        rfds, wfds, xfds = fds
+        if timeout == 0.0 and len(rfds) == 1 and not wfds and not xfds:
+            return False, (), (), ()
+        return self._select(rfds, wfds, xfds, timeout)
+
+    def _probe(self, rfds, wfds, xfds):
+        return self._select(rfds, wfds, xfds, 0.0)
 
     def _select(self, rfds, wfds, xfds, timeout):
         if timeout is not None and timeout <= 0.0 and not rfds and not wfds and not xfds:
@@ -189,7 +596,7 @@ class SelectLoop(object):
         return rfds_bad, wfds_bad, xfds_bad
 
     def _process(self, has_errors, rfds, wfds, xfds):
-        now = None
+        now = self._now
         nodes = self._nodes
 
         with self._lock:
@@ -205,26 +612,41 @@ class SelectLoop(object):
                 for node in self._excepts.get(fd, ()):
                     nodes[node][2].append(fd)
 
+            # Reset the flag before draining, so that a call delivered
+            # after the drain always wakes up the loop again.
+            deliveries = self._deliveries
+            self._delivery_pending = False
+            while deliveries:
+                calls.append(deliveries.popleft())
+                self._remote_calls += 1
+
             for node, (rfds, wfds, xfds) in nodes.iteritems():
                 func, args, keys = self._pop_node(node)
                 calls.append((func, (has_errors, rfds, wfds, xfds) + args, keys))
 
-            while self._heap:
-                timestamp, types, func, args, keys = self._heap.peek()
-                if timestamp == self._INFINITY:
-                    break
-                if timestamp > 0.0:
-                    if now is None:
-                        now = self._monotonic()
-                    if timestamp > now:
-                        break
-
-                if types is None:
-                    calls.append((func, args, keys))
-                else:
-                    calls.append((func, (False, (), (), ()) + args, keys))
-                self._pop_node(self._heap.head())
+            if self._heap:
+                for node, (_, types, func, args, keys) in self._heap.pop_nodes_until(now, _timestamp):
+                    if types is None:
+                        calls.append((func, args, keys))
+                    else:
+                        calls.append((func, (False, (), (), ()) + args, keys))
+                        self._pop_types(node, types)
+
+            if self._wheel:
+                for node, (_, types, func, args, keys) in self._wheel.advance(now):
+                    if types is None:
+                        calls.append((func, args, keys))
+                    else:
+                        calls.append((func, (False, (), (), ()) + args, keys))
+                        self._pop_types(node, types)
 
+            deferred = self._deferred
+            if deferred is not None:
+                self._deferred = None
+                deferred.extend(calls)
+                calls = deferred
+
+            self._wakeup = -self._INFINITY
             self._immediate = self._calls
             self._calls = calls
 
@@ -232,22 +654,403 @@ class SelectLoop(object):
         return calls
 
     def _perform(self, calls):
+        if self._trackers:
+            return self._perform_tracked(calls)
+
+        count = 0
+        budget = self._budget
+
         self._local.current = calls
-        while calls:
-            func, args, keys = calls.popleft()
-            func(*args, **keys)
-        self._local.current = None
+        try:
+            while calls and count < budget:
+                func, args, keys = calls.popleft()
+                func(*args, **keys)
+                count += 1
+        finally:
+            self._local.current = None
+
+        if calls:
+            self._defer(calls)
+        return count
+
+    def _defer(self, calls):
+        self._deferred = calls
+        self._calls = collections.deque()
+
+    def _perform_tracked(self, calls):
+        count = 0
+        budget = self._budget
+        owner = self._owner
+
+        self._local.current = calls
+        try:
+            while calls and count < budget:
+                func, args, keys = calls.popleft()
+                self._sequence += 1
+                self._active = self._sequence, owner, func, args
+                func(*args, **keys)
+                count += 1
+        finally:
+            self._active = None
+            self._local.current = None
+
+        if calls:
+            self._defer(calls)
+        return count
+
+    def _collect_stats(self, count, wait_time, run_time):
+        with self._lock:
+            remote_calls = self._remote_calls
+            self._remote_calls = 0
+
+            timers = len(self._heap)
+            if self._wheel is not None:
+                timers += len(self._wheel)
+            fds = len(self._reads) + len(self._writes) + len(self._excepts)
+
+        deferred = len(self._deferred) if self._deferred is not None else 0
+        return IterationStats(count, wait_time, run_time, timers, fds, remote_calls, deferred)
 
     def iterate(self):
-        rfds, wfds, xfds, timeout = self._prepare()
-        has_errors, rfds, wfds, xfds = self._select(rfds, wfds, xfds, timeout)
+        self._owner = self._get_ident()
+
+        hooks = self._stats_hooks
+        if hooks:
+            return self._iterate_with_stats(hooks)
+
+        fds, timeout = self._prepare()
+        has_errors, rfds, wfds, xfds = self._wait(fds, timeout)
+        self._now = self._monotonic()
         calls = self._process(has_errors, rfds, wfds, xfds)
         self._perform(calls)
 
+    def _iterate_with_stats(self, hooks):
+        monotonic = self._monotonic
+
+        fds, timeout = self._prepare()
+        start = monotonic()
+        has_errors, rfds, wfds, xfds = self._wait(fds, timeout)
+        waited = self._now = monotonic()
+        calls = self._process(has_errors, rfds, wfds, xfds)
+        count = self._perform(calls)
+        end = monotonic()
+
+        stats = self._collect_stats(count, waited - start, end - waited)
+        for hook in hooks:
+            hook(stats)
+
+
+class EpollSelectLoop(SelectLoop):
+    _EPOLLIN = getattr(select, "EPOLLIN", 0x001)
+    _EPOLLPRI = getattr(select, "EPOLLPRI", 0x002)
+    _EPOLLOUT = getattr(select, "EPOLLOUT", 0x004)
+    _EPOLLERR = getattr(select, "EPOLLERR", 0x008)
+    _EPOLLHUP = getattr(select, "EPOLLHUP", 0x010)
+
+    _POLLIN = getattr(select, "POLLIN", 0x001)
+    _POLLPRI = getattr(select, "POLLPRI", 0x002)
+    _POLLOUT = getattr(select, "POLLOUT", 0x004)
+    _POLLERR = getattr(select, "POLLERR", 0x008)
+    _POLLHUP = getattr(select, "POLLHUP", 0x010)
+    _POLLNVAL = getattr(select, "POLLNVAL", 0x020)
+
+    _ENOENT = errno.ENOENT
+    _EEXIST = errno.EEXIST
+    _IOError = IOError
+    _native_epoll = getattr(select, "epoll", None)
+    _native_poll = getattr(select, "poll", None)
+
+    def __init__(self, *args, **keys):
+        SelectLoop.__init__(self, *args, **keys)
+
+        self._epoll = self._native_epoll()
+        self._epoll.register(self._rfd, self._EPOLLIN)
+
+        # Map each watched object to its file descriptor number, and each
+        # file descriptor number to the objects sharing it (e.g. a socket
+        # and its SSL wrapper).
+        self._filenos = {}
+        self._sharing = {}
+        self._bad = set()
+
+        # The registrations currently in the kernel: the event mask and the
+        # objects the registration is known to be valid for. Interest
+        # changes only mark descriptors dirty, and the kernel is updated
+        # once per iteration for the descriptors whose mask really changed.
+        self._masks = {}
+        self._owners = {}
+        self._dirty = set()
+        self._idle = set()
+
+    def _fileno(self, fd):
+        if isinstance(fd, (int, long)):
+            return fd
+        return fd.fileno()
+
+    def _watch(self, fd):
+        fileno = self._filenos.get(fd, None)
+
+        if fd not in self._reads and fd not in self._writes and fd not in self._excepts:
+            self._bad.discard(fd)
+            if fileno is None:
+                return
+
+            del self._filenos[fd]
+            sharing = self._sharing[fileno]
+            sharing.discard(fd)
+            if not sharing:
+                del self._sharing[fileno]
+        elif fileno is None:
+            if fd in self._bad:
+                return
+
+            try:
+                fileno = self._fileno(fd)
+            except self._BaseException:
+                self._bad.add(fd)
+                return
+            self._filenos[fd] = fileno
+            self._sharing.setdefault(fileno, set()).add(fd)
+
+        self._dirty.add(fileno)
+
+    def _flush(self):
+        idle = self._idle
+        self._idle = set()
+
+        dirty = self._dirty
+        self._dirty = set()
+        for fileno in dirty:
+            self._update(fileno)
+
+        for fileno in idle:
+            if fileno not in self._sharing and fileno not in self._idle:
+                self._register(fileno, 0)
+
+    def _update(self, fileno):
+        objs = self._sharing.get(fileno, ())
+
+        mask = 0
+        for obj in objs:
+            if obj in self._reads:
+                mask |= self._EPOLLIN
+            if obj in self._writes:
+                mask |= self._EPOLLOUT
+            if obj in self._excepts:
+                mask |= self._EPOLLPRI
+
+        old_mask = self._masks.get(fileno, 0)
+        if not mask:
+            # Keep read-only registrations around for one more iteration,
+            # as the typical recv loop re-registers the same socket right
+            # away. Write interest is dropped immediately, because an idle
+            # writable registration would keep waking up the loop.
+            if old_mask and not old_mask & self._EPOLLOUT:
+                self._idle.add(fileno)
+            else:
+                self._register(fileno, 0)
+            return
+
+        # A registration can only be trusted for the objects it was made
+        # for: a new object may have got a recycled descriptor number whose
+        # previous file the kernel has already dropped from the epoll set.
+        owners = self._owners.get(fileno, ())
+        for obj in objs:
+            if obj not in owners or isinstance(obj, (int, long)):
+                break
+        else:
+            if mask == old_mask:
+                return
+
+        self._register(fileno, mask)
+        if fileno in self._masks:
+            self._owners[fileno] = set(objs)
+
+    def _register(self, fileno, mask):
+        old_mask = self._masks.pop(fileno, 0)
+        self._owners.pop(fileno, None)
+
+        try:
+            if not mask:
+                if old_mask:
+                    self._epoll.unregister(fileno)
+            elif not old_mask:
+                self._ctl(self._epoll.register, self._EEXIST, self._epoll.modify, fileno, mask)
+            else:
+                self._ctl(self._epoll.modify, self._ENOENT, self._epoll.register, fileno, mask)
+        except self._IOError:
+            # The descriptor has been closed (and maybe already dropped from
+            # the epoll set by the kernel) or does not support polling at
+            # all. Mark the objects bad so that their waiters get woken up
+            # with an error, just like select.select would do.
+            if mask:
+                self._bad.update(self._sharing.get(fileno, ()))
+            return
+
+        if mask:
+            self._masks[fileno] = mask
+
+    def _ctl(self, func, retry_errno, retry_func, fileno, mask):
+        try:
+            func(fileno, mask)
+        except self._IOError as error:
+            if error.errno != retry_errno:
+                raise
+            retry_func(fileno, mask)
+
+    def _snapshot(self):
+        if self._dirty or self._idle:
+            self._flush()
+
+        if not self._bad:
+            return None
+
+        rfds = tuple(x for x in self._bad if x in self._reads)
+        wfds = tuple(x for x in self._bad if x in self._writes)
+        xfds = tuple(x for x in self._bad if x in self._excepts)
+        return rfds, wfds, xfds
+
+    def _wait(self, bad, timeout):
+        if bad is not None:
+            return (True,) + bad
+
+        if timeout is None:
+            timeout = -1
+
+        try:
+            events = self._epoll.poll(timeout)
+        except self._IOError as error:
+            if error.errno == self._EINTR:
+                return False, (), (), ()
+            raise
+        if not events:
+            return False, (), (), ()
+
+        rfds = []
+        wfds = []
+        xfds = []
+        rmask = self._EPOLLIN | self._EPOLLERR | self._EPOLLHUP
+        wmask = self._EPOLLOUT | self._EPOLLERR | self._EPOLLHUP
+        xmask = self._EPOLLPRI
+
+        with self._lock:
+            for fileno, mask in events:
+                for obj in self._sharing.get(fileno, ()):
+                    if mask & rmask and obj in self._reads:
+                        rfds.append(obj)
+                    if mask & wmask and obj in self._writes:
+                        wfds.append(obj)
+                    if mask & xmask and obj in self._excepts:
+                        xfds.append(obj)
+        return False, rfds, wfds, xfds
+
+    def _probe(self, rfds, wfds, xfds):
+        # select.select can not handle descriptors above FD_SETSIZE, so use
+        # a one-shot poll object for the zero-timeout check. Descriptors
+        # that can not be polled are left for the registration step to
+        # report as errors.
+        masks = {}
+        try:
+            for fds, mask in [(rfds, self._POLLIN), (wfds, self._POLLOUT), (xfds, self._POLLPRI)]:
+                for fd in fds:
+                    fileno = self._fileno(fd)
+                    masks[fileno] = masks.get(fileno, 0) | mask
+        except self._BaseException:
+            return False, (), (), ()
+
+        if not masks:
+            return False, (), (), ()
+
+        poll = self._native_poll()
+        for fileno, mask in masks.iteritems():
+            poll.register(fileno, mask)
+
+        try:
+            events = dict(poll.poll(0))
+        except self._BaseException:
+            return False, (), (), ()
+        if not events:
+            return False, (), (), ()
+
+        rmask = self._POLLIN | self._POLLERR | self._POLLHUP
+        wmask = self._POLLOUT | self._POLLERR | self._POLLHUP
+        for mask in events.itervalues():
+            if mask & self._POLLNVAL:
+                return False, (), (), ()
+
+        outr = [x for x in rfds if events.get(self._fileno(x), 0) & rmask]
+        outw = [x for x in wfds if events.get(self._fileno(x), 0) & wmask]
+        outx = [x for x in xfds if events.get(self._fileno(x), 0) & self._POLLPRI]
+        return False, outr, outw, outx
+
+
+_BACKENDS = {
+    "select": SelectLoop,
+    "epoll": EpollSelectLoop
+}
+_DEFAULT_BACKEND = "epoll" if hasattr(select, "epoll") else "select"
+
+
+def create_select_loop(backend=None, resolution=None, budget=None):
+    """
+    Return a new select loop using the given backend ("select", "epoll" or
+    "auto"). When backend is None it is read from the IDIOKIT_SELECT_BACKEND
+    environment variable, defaulting to "auto". The "auto" backend picks
+    epoll when the platform supports it and select.select otherwise.
+
+    The resolution (in seconds) of the loop's timing wheel is read from the
+    IDIOKIT_TIMER_RESOLUTION environment variable when not given, and
+    defaults to DEFAULT_RESOLUTION. A zero resolution disables the wheel
+    and keeps all timers in a heap with exact deadlines.
+
+    The per-iteration callback budget (see SelectLoop.set_budget) is read
+    from the IDIOKIT_CALLBACK_BUDGET environment variable when not given.
+    By default there is no budget.
+
+    >>> isinstance(create_select_loop("select"), SelectLoop)
+    True
+    >>> create_select_loop("kqueue")
+    Traceback (most recent call last):
+        ...
+    ValueError: unknown select loop backend 'kqueue'
+    """
+
+    if backend is None:
+        backend = os.environ.get("IDIOKIT_SELECT_BACKEND", "auto")
+
+    if backend == "auto":
+        backend = _DEFAULT_BACKEND
+
+    if backend not in _BACKENDS:
+        raise ValueError("unknown select loop backend {0!r}".format(backend))
+
+    if resolution is None:
+        resolution = float(os.environ.get("IDIOKIT_TIMER_RESOLUTION", DEFAULT_RESOLUTION))
+
+    if budget is None:
+        budget = os.environ.get("IDIOKIT_CALLBACK_BUDGET", None)
+        if budget is not None:
+            budget = int(budget)
+    return _BACKENDS[backend](resolution, budget=budget)
+
 
-global_select_loop = SelectLoop()
+global_select_loop = create_select_loop()
 select = global_select_loop.select
+wait = global_select_loop.wait
+closing = global_select_loop.closing
 sleep = global_select_loop.sleep
+sleep_with_slack = global_select_loop.sleep_with_slack
 asap = global_select_loop.asap
+deliver = global_select_loop.deliver
+now = global_select_loop.now
+update_now = global_select_loop.update_now
+set_budget = global_select_loop.set_budget
+add_signal_handler = global_select_loop.add_signal_handler
+remove_signal_handler = global_select_loop.remove_signal_handler
 cancel = global_select_loop.cancel
 iterate = global_select_loop.iterate
+add_stats_hook = global_select_loop.add_stats_hook
+remove_stats_hook = global_select_loop.remove_stats_hook
+enable_call_tracking = global_select_loop.enable_call_tracking
+disable_call_tracking = global_select_loop.disable_call_tracking
+active_call = global_select_loop.active_call
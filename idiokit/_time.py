@@ -4,6 +4,7 @@ import os
 import sys
 import time
 import ctypes
+import threading
 import ctypes.util
 
 
@@ -66,6 +67,7 @@ class LinuxTime(object):
     _byref = ctypes.byref
     _strerror = os.strerror
     _get_errno = ctypes.get_errno
+    _AttributeError = AttributeError
 
     class _timespec(ctypes.Structure):
         _fields_ = [
@@ -79,11 +81,25 @@ class LinuxTime(object):
         self._clock_gettime.restype = ctypes.c_int
         self._clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(self._timespec)]
 
+        # Reuse one timespec per thread instead of allocating a new one for
+        # each call. The structure can't be shared between threads, as
+        # ctypes releases the GIL for the duration of the call.
+        self._local = threading.local()
+
         self.monotonic()
 
-    def monotonic(self):
+    def _spec(self):
         spec = self._timespec()
-        res = self._clock_gettime(self.CLOCK_MONOTONIC, self._byref(spec))
+        self._local.spec = spec, self._byref(spec)
+        return self._local.spec
+
+    def monotonic(self):
+        try:
+            spec, ref = self._local.spec
+        except self._AttributeError:
+            spec, ref = self._spec()
+
+        res = self._clock_gettime(self.CLOCK_MONOTONIC, ref)
         if res == -1:
             error = self._get_errno()
             raise OSError(error, self._strerror(error))
@@ -0,0 +1,191 @@
+from __future__ import absolute_import
+
+import sys
+
+from . import idiokit
+
+
+BLOCK = "block"
+DROP = "drop"
+DISCONNECT = "disconnect"
+
+_POLICIES = frozenset([BLOCK, DROP, DISCONNECT])
+
+
+class Overflow(Exception):
+    pass
+
+
+class _Subscription(object):
+    __slots__ = "offset", "waiter"
+
+    def __init__(self, offset):
+        self.offset = offset
+        self.waiter = None
+
+
+class Broadcast(idiokit.Proxy):
+    """
+    A stream that delivers each message piped into it to every subscriber.
+    Messages are stored once in a shared ring buffer of the given size, and
+    each subscriber reads the buffer at its own offset. Subscribers only
+    get the messages sent after they subscribed.
+
+    The policy decides what happens when the buffer is full because some
+    subscriber lags behind: BLOCK stops reading input until the subscriber
+    catches up, DROP makes the subscriber skip the oldest messages and
+    DISCONNECT makes the subscriber stream fail with Overflow.
+    """
+
+    def __init__(self, size=1024, policy=BLOCK):
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        if policy not in _POLICIES:
+            raise ValueError("unknown policy {0!r}".format(policy))
+
+        self.dropped = 0
+
+        self._size = size
+        self._policy = policy
+        self._slots = [None] * size
+        self._start = 0
+        self._end = 0
+        self._finished = False
+        self._error = None
+
+        # Maps offsets to the number of subscribers that will read that
+        # offset next. Subscribers that have lagged behind the start of the
+        # buffer are counted at the start.
+        self._counts = {}
+        self._waiting = set()
+        self._input_waiter = None
+
+        idiokit.Proxy.__init__(self, self._input())
+
+    def _count(self, offset, delta):
+        count = self._counts.get(offset, 0) + delta
+        if count:
+            self._counts[offset] = count
+        else:
+            del self._counts[offset]
+
+    def _trim(self):
+        while self._start < self._end and self._start not in self._counts:
+            self._slots[self._start % self._size] = None
+            self._start += 1
+
+    def _drop_oldest(self):
+        count = self._counts.pop(self._start, 0)
+        self._slots[self._start % self._size] = None
+        self._start += 1
+        if count:
+            self._count(self._start, count)
+
+    def _make_room(self):
+        if self._end - self._start < self._size:
+            return True
+
+        self._trim()
+        if self._end - self._start < self._size:
+            return True
+
+        if self._policy == BLOCK:
+            return False
+
+        self._drop_oldest()
+        return True
+
+    def _wake_subscribers(self):
+        waiting = self._waiting
+        self._waiting = set()
+
+        for subscription in waiting:
+            waiter = subscription.waiter
+            subscription.waiter = None
+            waiter.succeed()
+
+    def _wake_input(self):
+        waiter = self._input_waiter
+        if waiter is not None:
+            self._input_waiter = None
+            waiter.succeed()
+
+    @idiokit.stream
+    def _input(self):
+        try:
+            while True:
+                try:
+                    items = yield idiokit.next_batch(self._size)
+                except StopIteration:
+                    return
+
+                for item in items:
+                    if not self._make_room():
+                        self._wake_subscribers()
+
+                        while not self._make_room():
+                            self._input_waiter = idiokit.Event()
+                            yield self._input_waiter
+
+                    self._slots[self._end % self._size] = item
+                    self._end += 1
+                self._wake_subscribers()
+        except:
+            self._error = sys.exc_info()
+            raise
+        finally:
+            self._finished = True
+            self._input_waiter = None
+            self._wake_subscribers()
+
+    def subscribe(self):
+        """
+        Return a new stream that outputs the messages sent to the broadcast
+        from now on. The stream finishes after the broadcast input has
+        finished and all the buffered messages have been delivered. When
+        the input fails the stream fails with the same exception after
+        delivering the buffered messages.
+        """
+
+        subscription = _Subscription(self._end)
+        self._count(subscription.offset, 1)
+        return self._subscriber(subscription)
+
+    @idiokit.stream
+    def _subscriber(self, subscription):
+        try:
+            while True:
+                offset = subscription.offset
+                if offset < self._start:
+                    if self._policy == DISCONNECT:
+                        raise Overflow("subscriber lagged behind by more than {0} messages".format(self._size))
+                    self.dropped += self._start - offset
+                    offset = self._start
+
+                end = self._end
+                if offset < end:
+                    slots = self._slots
+                    size = self._size
+                    batch = [slots[index % size] for index in xrange(offset, end)]
+
+                    self._count(offset, -1)
+                    self._count(end, 1)
+                    subscription.offset = end
+                    self._wake_input()
+
+                    yield idiokit.send_many(batch)
+                    continue
+
+                if self._finished:
+                    if self._error is not None:
+                        exc_type, exc_value, exc_tb = self._error
+                        raise exc_type, exc_value, exc_tb
+                    return
+
+                subscription.waiter = idiokit.Event()
+                self._waiting.add(subscription)
+                yield subscription.waiter
+        finally:
+            self._waiting.discard(subscription)
+            self._count(max(subscription.offset, self._start), -1)
+            self._wake_input()
@@ -1,13 +1,18 @@
+import heapq
+import itertools
+
+
 class HeapError(Exception):
     pass
 
 
 class Heap(object):
     def __init__(self, iterable=()):
-        self._heap = []
+        self._heap = [_Node(index, value) for index, value in enumerate(iterable)]
 
-        for value in iterable:
-            self.push(value)
+        # Bottom-up heapify, O(n) instead of O(n log n) for n pushes.
+        for index in xrange(len(self._heap) // 2 - 1, -1, -1):
+            _down(self._heap, self._heap[index])
 
     def _get(self, node):
         if not self._heap:
@@ -48,6 +53,138 @@ class Heap(object):
         return len(self._heap)
 
 
+class LazyHeap(object):
+    """
+    A Heap variant with lazy removal: pop(node) only marks the node as
+    removed, and the removed nodes get dropped when they reach the top or
+    when they outnumber the live ones. Cancelling is then O(1), and the
+    ordering work is done by the heapq module.
+
+    >>> heap = LazyHeap([5, 1, 4])
+    >>> node = heap.push(2)
+    >>> heap.pop(node)
+    2
+    >>> heap.pop_until(4)
+    [1, 4]
+    >>> len(heap), heap.peek()
+    (1, 5)
+    """
+
+    _MIN_COMPACT = 64
+
+    def __init__(self, iterable=()):
+        self._heap = []
+        self._live = 0
+        self._counter = itertools.count()
+        self.push_many(iterable)
+
+    def _entry(self, value):
+        # The counter keeps equal values from being compared by their nodes.
+        return value, next(self._counter), _Node(0, value)
+
+    def push(self, value):
+        entry = self._entry(value)
+        heapq.heappush(self._heap, entry)
+        self._live += 1
+        return entry[2]
+
+    def push_many(self, values):
+        """
+        Push all the values and return their nodes. Heapifies everything in
+        linear time when the batch is large compared to the heap.
+        """
+
+        entries = [self._entry(value) for value in values]
+        if len(entries) > len(self._heap):
+            self._heap.extend(entries)
+            heapq.heapify(self._heap)
+        else:
+            for entry in entries:
+                heapq.heappush(self._heap, entry)
+
+        self._live += len(entries)
+        return [entry[2] for entry in entries]
+
+    def _prune(self):
+        heap = self._heap
+        while heap and heap[0][2]._index < 0:
+            heapq.heappop(heap)
+
+    def _compact(self):
+        self._heap = [entry for entry in self._heap if entry[2]._index >= 0]
+        heapq.heapify(self._heap)
+
+    def _get(self, node):
+        if node is None:
+            self._prune()
+            if not self._heap:
+                raise HeapError("empty heap")
+            return self._heap[0][2]
+
+        if node._index < 0:
+            raise HeapError("node not in the heap")
+        return node
+
+    def _kill(self, node):
+        node._index = -1
+        self._live -= 1
+
+    def peek(self, node=None):
+        return self._get(node)._value
+
+    def pop(self, node=None):
+        if node is None:
+            self._prune()
+            if not self._heap:
+                raise HeapError("empty heap")
+            node = heapq.heappop(self._heap)[2]
+        elif node._index < 0:
+            raise HeapError("node not in the heap")
+
+        self._kill(node)
+
+        dead = len(self._heap) - self._live
+        if dead > self._live and dead >= self._MIN_COMPACT:
+            self._compact()
+        return node._value
+
+    def pop_until(self, limit, key=None):
+        """
+        Pop all values up to and including limit (compared to key(value)
+        when key is given) and return them in order.
+        """
+
+        return [value for _, value in self.pop_nodes_until(limit, key)]
+
+    def pop_nodes_until(self, limit, key=None):
+        """
+        Like pop_until(...), but return (node, value) pairs.
+        """
+
+        heap = self._heap
+        heappop = heapq.heappop
+
+        pairs = []
+        while heap:
+            value, _, node = heap[0]
+            if node._index < 0:
+                heappop(heap)
+                continue
+            if (value if key is None else key(value)) > limit:
+                break
+
+            heappop(heap)
+            self._kill(node)
+            pairs.append((node, value))
+        return pairs
+
+    def head(self):
+        return self._get(None)
+
+    def __len__(self):
+        return self._live
+
+
 class _Node(object):
     __slots__ = "_index", "_value"
 
@@ -20,7 +20,7 @@ from email.message import Message
 from email.parser import HeaderParser
 from numbers import Integral
 
-from .. import idiokit, socket, timer
+from .. import idiokit, socket
 from . import httpversion
 from . import date
 
@@ -194,7 +194,7 @@ class _Chunked(object):
 
     @idiokit.stream
     def _done(self, amount):
-        yield timer.sleep(0.0)
+        yield idiokit.finished()
         idiokit.stop("", self._done, ())
 
     @idiokit.stream
@@ -222,7 +222,7 @@ class _Limited(object):
     def read(self, amount):
         amount = min(amount, self._limit)
         if amount == 0:
-            yield timer.sleep(0.0)
+            yield idiokit.finished()
             idiokit.stop("")
 
         data = yield self._buffered.read(amount)
@@ -373,14 +373,14 @@ class _RawWriter(object):
         if data:
             yield self._socket.sendall(data)
         else:
-            yield timer.sleep(0.0)
+            yield idiokit.finished()
 
     @idiokit.stream
     def finish(self):
         if self._finished:
             return
         self._finished = True
-        yield timer.sleep(0.0)
+        yield idiokit.finished()
 
 
 class _LimitedWriter(object):
@@ -403,7 +403,7 @@ class _LimitedWriter(object):
             self._done += len(data)
             yield self._socket.sendall(data)
         else:
-            yield timer.sleep(0.0)
+            yield idiokit.finished()
 
     @idiokit.stream
     def finish(self):
@@ -412,7 +412,7 @@ class _LimitedWriter(object):
         if self._done < self._length:
             raise WriterFinishError("did not write all {0} bytes".format(self._length))
         self._finished = True
-        yield timer.sleep(0.0)
+        yield idiokit.finished()
 
 
 class _ChunkedWriter(object):
@@ -428,7 +428,7 @@ class _ChunkedWriter(object):
         if data:
             yield self._socket.sendall(b"{0:x}\r\n{1}\r\n".format(len(data), data))
         else:
-            yield timer.sleep(0.0)
+            yield idiokit.finished()
 
     @idiokit.stream
     def finish(self, check_error=True):
@@ -488,25 +488,14 @@ class _ServerResponse(object):
             yield self.write_headers({})
         yield self._writer.write(data)
 
-    @idiokit.stream
     def write_stream(self, buffer_size=2 ** 14):
-        while True:
-            chunk = yield idiokit.next()
-            buf = [chunk]
-            buf_length = len(chunk)
+        return idiokit.window(max_bytes=buffer_size, max_delay=0.0) | self._write_windows()
 
-            try:
-                while buf_length < buffer_size:
-                    chunk = yield timer.timeout(0.0, idiokit.next())
-                    buf.append(chunk)
-                    buf_length += len(chunk)
-            except StopIteration as stop:
-                yield self.write("".join(buf))
-                raise stop
-            except timer.Timeout:
-                pass
-
-            yield self.write("".join(buf))
+    @idiokit.stream
+    def _write_windows(self):
+        while True:
+            chunks = yield idiokit.next()
+            yield self.write("".join(chunks))
 
     @idiokit.stream
     def finish(self):
@@ -606,7 +595,7 @@ class _Supervisor(object):
 
     @idiokit.stream
     def supervise(self, task):
-        yield timer.sleep(0.0)
+        yield idiokit.finished()
 
         if self._main is None:
             event = idiokit.Event()
@@ -659,7 +648,7 @@ class Server(object):
 
     @idiokit.stream
     def request(self, addr, request, response):
-        yield timer.sleep(0.0)
+        yield idiokit.finished()
 
 
 class _Server(Server):
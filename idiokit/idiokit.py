@@ -4,11 +4,11 @@ import sys
 import signal
 import inspect
 import numbers
-import threading
 import collections
-from functools import wraps
+from functools import wraps, partial
 
-from ._selectloop import sleep, asap, iterate
+from . import _time
+from ._selectloop import sleep, cancel, asap, iterate, add_signal_handler, remove_signal_handler
 from .values import Value
 
 __version__ = "2.8.1"
@@ -146,7 +146,7 @@ class Stream(object):
     def __or__(self, other):
         if not isinstance(other, Stream):
             return NotImplemented
-        return _PipePair(self, other)
+        return _Pipeline.join((self, other))
 
 
 class _Fork(Stream):
@@ -322,8 +322,35 @@ class _Fork(Stream):
 class GeneratorBasedStream(Stream):
     _running = set()
 
+    # While non-zero, each new stream records its logical path: the code
+    # objects of the streams that (transitively) created it, ending with
+    # its own generator function. Used by idiokit.profiler.
+    _tracing = 0
+    _MAX_PATH_LENGTH = 64
+    _path = None
+
+    # While non-zero, each new stream records its creation time and the
+    # (filename, line number, function name) of the code that created it.
+    # Used by idiokit.monitor.
+    _tracking = 0
+    _created = None
+    _site = None
+
+    _monotonic = staticmethod(_time.monotonic)
+
+    # The number of nested _next calls currently running. A generator
+    # that yields an already finished stream gets resumed right away, as
+    # long as the nesting stays below _MAX_DEPTH.
+    _depth = 0
+    _MAX_DEPTH = 32
+
     def __init__(self, gen):
         self._gen = gen
+        if self._tracing:
+            self._path = self._trace_path(gen)
+        if self._tracking:
+            self._created = self._monotonic()
+            self._site = self._creation_site()
 
         self._messages = Piped()
         self._signals = Piped()
@@ -332,6 +359,7 @@ class GeneratorBasedStream(Stream):
         self._head = Value()
         self._tail = self._head
 
+        self._current_stream = None
         self._current_promise = None
         self._current_result = None
         self._current_head = None
@@ -347,6 +375,7 @@ class GeneratorBasedStream(Stream):
             self = None
 
     def _next(self, throw, args):
+        GeneratorBasedStream._depth += 1
         try:
             if throw:
                 next = require_stream(self._gen.throw(*args))
@@ -359,10 +388,13 @@ class GeneratorBasedStream(Stream):
         else:
             next._pipe(self._messages.head(), self._signals.head(), self._broken.head())
 
+            self._current_stream = next
             self._current_result = next.result()
             self._current_head = next.head()
             self._on_promise(None, None)
         finally:
+            GeneratorBasedStream._depth -= 1
+
             # Set all local variables to None so references to their
             # original values won't be held in potential traceback objects.
             self = None
@@ -371,6 +403,102 @@ class GeneratorBasedStream(Stream):
             throw = None
             args = None
 
+    @classmethod
+    def _trace_path(cls, gen):
+        path = ()
+
+        frame = sys._getframe(1)
+        try:
+            while frame is not None:
+                if frame.f_code is _NEXT_CODE:
+                    parent = frame.f_locals.get("self", None)
+                    if parent is not None:
+                        path = parent.path()
+                    break
+                frame = frame.f_back
+        finally:
+            frame = None
+
+        return path[-(cls._MAX_PATH_LENGTH - 1):] + (gen.gi_code,)
+
+    @staticmethod
+    def _creation_site():
+        frame = sys._getframe(2)
+        try:
+            while frame is not None and frame.f_code is _STREAM_CODE:
+                frame = frame.f_back
+            if frame is None:
+                return None
+            code = frame.f_code
+            return code.co_filename, frame.f_lineno, code.co_name
+        finally:
+            frame = None
+
+    def path(self):
+        if self._path is not None:
+            return self._path
+        if self._gen is not None:
+            return (self._gen.gi_code,)
+        return ()
+
+    def function(self):
+        """
+        Return the generator function's code object, or None if the
+        stream has already finished.
+        """
+
+        if self._gen is None:
+            return None
+        return self._gen.gi_code
+
+    def creation_site(self):
+        """
+        Return a (filename, line number, function name) tuple describing
+        where the stream was created, or None if stream tracking was not
+        enabled at the time.
+        """
+
+        return self._site
+
+    def age(self):
+        """
+        Return the seconds since the stream was created, or None if stream
+        tracking was not enabled at the time.
+        """
+
+        if self._created is None:
+            return None
+        return self._monotonic() - self._created
+
+    def yield_site(self):
+        """
+        Return a (filename, line number) tuple for the yield statement the
+        generator is currently suspended on, or None if it's not suspended.
+        """
+
+        gen = self._gen
+        if gen is None or gen.gi_frame is None or gen.gi_running:
+            return None
+        frame = gen.gi_frame
+        return frame.f_code.co_filename, frame.f_lineno
+
+    def waiting_on(self):
+        """
+        Return the stream the generator has yielded and is waiting on, or
+        None.
+        """
+
+        return self._current_stream
+
+    @classmethod
+    def running(cls):
+        """
+        Return a list of the generator based streams that have been started
+        but have not finished yet.
+        """
+
+        return list(cls._running)
+
     def _on_promise(self, _, __):
         while True:
             if self._current_promise is None:
@@ -410,11 +538,18 @@ class GeneratorBasedStream(Stream):
             result.unsafe_listen(self._on_result)
             return
 
+        self._current_stream = None
         self._current_promise = None
         self._current_result = None
         self._current_head = None
         throw, args = result.unsafe_get()
-        sleep(0.0, self._next, throw, args)
+
+        # A non-zero depth means that this call originates from our own
+        # _next call, i.e. the yielded stream had finished already.
+        if 0 < GeneratorBasedStream._depth < self._MAX_DEPTH:
+            self._next(throw, args)
+        else:
+            sleep(0.0, self._next, throw, args)
 
     def _close(self, throw, args):
         self._messages.close()
@@ -440,6 +575,9 @@ class GeneratorBasedStream(Stream):
         return self._result
 
 
+_NEXT_CODE = GeneratorBasedStream._next.im_func.func_code
+
+
 class Next(Stream):
     def __init__(self):
         self._result = Value()
@@ -555,6 +693,143 @@ class Event(Next):
         Next._pipe(self, NULL, signals, broken)
 
 
+class _NextBatch(Stream):
+    def __init__(self, max_items):
+        self._max_items = max_items
+        self._result = Value()
+        self._closed = False
+
+        # Each cursor is a [head, is_message] pair. The promise of a cursor
+        # that has been consumed before its value was known is in _taken.
+        self._cursors = []
+        self._taken = None
+        self._watched = set()
+        self._batch = []
+
+    def _take(self, is_message, result):
+        if result is None:
+            return True
+
+        if not is_message or result[0]:
+            self._close(result)
+            return False
+
+        self._batch.append(peel_args(result[1]))
+        if len(self._batch) >= self._max_items:
+            self._finish()
+            return False
+
+        if len(self._batch) == 1:
+            # Collect the messages that become available during this loop
+            # iteration, and deliver the batch on the next one.
+            sleep(0.0, self._finish)
+        return True
+
+    def _watch(self, value):
+        value.unsafe_listen(self._advance)
+        self._watched.add(value)
+
+    def _advance(self, _=None, __=None):
+        if self._closed:
+            return
+
+        taken = self._taken
+        if taken is not None:
+            consume, value, head = taken[0].unsafe_get()
+            if not value.unsafe_is_set():
+                self._watch(value)
+                return
+
+            self._taken = None
+            taken[0] = head
+            if not self._take(taken[1], value.unsafe_get()):
+                return
+
+        progress = True
+        while progress:
+            progress = False
+
+            for cursor in list(self._cursors):
+                head, is_message = cursor
+                if not head.unsafe_is_set():
+                    self._watch(head)
+                    continue
+
+                promise = head.unsafe_get()
+                if promise is None:
+                    self._cursors.remove(cursor)
+                    if is_message and self._batch:
+                        self._finish()
+                        return
+                    continue
+
+                consume, value, next_head = promise
+                if self._batch:
+                    # Once the batch is non-empty only take messages that
+                    # are already known to be there. Everything else is
+                    # left for whoever reads the pipe next.
+                    if not is_message:
+                        self._finish()
+                        return
+
+                    if not value.unsafe_is_set():
+                        self._watch(value)
+                        continue
+
+                    result = value.unsafe_get()
+                    if result is not None and result[0]:
+                        self._finish()
+                        return
+
+                consume.unsafe_set()
+                if not value.unsafe_is_set():
+                    self._taken = cursor
+                    self._watch(value)
+                    return
+
+                cursor[0] = next_head
+                if not self._take(is_message, value.unsafe_get()):
+                    return
+                progress = True
+
+    def _finish(self):
+        if self._closed:
+            return
+        self._close((False, (self._batch,)))
+
+    def _close(self, result):
+        if self._closed:
+            return
+        self._closed = True
+
+        for value in self._watched:
+            value.unsafe_unlisten(self._advance)
+        self._watched = None
+        self._cursors = None
+        self._taken = None
+        self._batch = None
+
+        self._result.unsafe_set(result)
+
+    def _do_pipe(self, heads):
+        if self._closed:
+            return
+
+        for head, is_message in heads:
+            if head is not NULL:
+                self._cursors.append([head, is_message])
+        self._advance()
+
+    def _pipe(self, messages, signals, broken):
+        asap(self._do_pipe, ((signals, False), (broken, False), (messages, True)))
+
+    def head(self):
+        return NULL
+
+    def result(self):
+        return self._result
+
+
 class _Send(Next):
     _CONSUMED = object()
     _RESULT = Value((NULL, Value(_CONSUMED), NULL))
@@ -618,7 +893,85 @@ class _SendTo(_Send):
         return NULL
 
 
-class _PipePair(Stream):
+class _SendMany(Next):
+    def __init__(self, messages):
+        Next.__init__(self)
+
+        # Build a chain of message promises up front. The value of each
+        # message gets set only after the previous message has been
+        # consumed, so at most one message is on offer at a time and the
+        # rest can still be retracted if the sending gets interrupted.
+        self._messages = messages
+        self._index = 0
+        self._promises = []
+
+        head = NULL
+        for _ in messages:
+            promise = Value(), Value(), head
+            self._promises.append(promise)
+            head = Value(promise)
+        self._promises.reverse()
+        self._head = head
+
+        if not messages:
+            Next._pipe(self, _Send._RESULT, NULL, NULL)
+            return
+
+        consumed, value, _ = self._promises[0]
+        value.unsafe_set((False, messages[0]))
+        consumed.unsafe_listen(self._on_consumed)
+
+    def _on_consumed(self, _, __):
+        self._index += 1
+        if self._index >= len(self._promises):
+            Next._pipe(self, _Send._RESULT, NULL, NULL)
+            return
+
+        consumed, value, _ = self._promises[self._index]
+        value.unsafe_set((False, self._messages[self._index]))
+        consumed.unsafe_listen(self._on_consumed)
+
+    def _close(self, result):
+        if result is _Send._CONSUMED:
+            result = False, ()
+        elif self._index < len(self._promises):
+            consumed, _, _ = self._promises[self._index]
+            consumed.unsafe_unlisten(self._on_consumed)
+
+            for consumed, value, _ in self._promises[self._index:]:
+                value.unsafe_set(None)
+                consumed.unsafe_set()
+
+        self._messages = None
+        self._promises = None
+        Next._close(self, result)
+
+    def _pipe(self, _, signals, broken):
+        Next._pipe(self, NULL, signals, broken)
+
+    def head(self):
+        return self._head
+
+
+class _Finished(Stream):
+    def __init__(self, args):
+        self._result = Value((False, args))
+
+    def _pipe(self, messages, signals, broken):
+        pass
+
+    def head(self):
+        return NULL
+
+    def result(self):
+        return self._result
+
+
+class _Link(object):
+    # Connects two adjacent stages of a _Pipeline: forwards the left stage's
+    # messages to the right stage, and tells each side when the other one
+    # has finished.
+
     def __init__(self, left, right):
         self._left = left
         self._right = right
@@ -626,17 +979,16 @@ class _PipePair(Stream):
         self._message_head = Value()
         self._signal_head = Value()
         self._broken_head = Value()
-        right._pipe(self._message_head, self._signal_head, NULL)
-        left._pipe(NULL, NULL, self._broken_head)
 
-        self._result = Value()
+        self._forward = self._message_promise
 
-        self._right.result().listen(self._right_result)
-        self._left.result().listen(self._left_result)
-        self._left.head().listen(self._message_promise)
+    def _connect(self):
+        self._right._pipe(self._message_head, self._signal_head, NULL)
+        self._left._pipe(NULL, NULL, self._broken_head)
+        self._left.head().listen(self._forward)
 
-    def _left_result(self, _, (throw, args)):
-        if self._check_result():
+    def _left_result(self, throw, args):
+        if self._right.result().unsafe_is_set():
             return
 
         if throw:
@@ -644,8 +996,8 @@ class _PipePair(Stream):
         else:
             self._signal_head.unsafe_set(None)
 
-    def _right_result(self, _, (throw, args)):
-        if self._check_result():
+    def _right_result(self, throw, args):
+        if self._left.result().unsafe_is_set():
             return
 
         if not throw:
@@ -653,23 +1005,6 @@ class _PipePair(Stream):
             args = (BrokenPipe, BrokenPipe(*args), None)
         self._broken_head.unsafe_set((NULL, Value((throw, args)), NULL))
 
-    def _check_result(self):
-        result = self._result
-        if result.unsafe_is_set():
-            return True
-
-        left_result = self._left.result()
-        if not left_result.unsafe_is_set():
-            return False
-
-        right_result = self._right.result()
-        if not right_result.unsafe_is_set():
-            return False
-
-        result_value = right_result.unsafe_get()
-        self._result.unsafe_set(result_value)
-        return True
-
     def _message_promise(self, _, promise):
         if self._right.result().unsafe_is_set():
             return
@@ -685,19 +1020,74 @@ class _PipePair(Stream):
         self._message_head = new_head
 
         old_head.unsafe_set((consume, value, new_head))
-        head.unsafe_listen(self._message_promise)
+        head.unsafe_listen(self._forward)
 
     def _message_final(self, _, (throw, args)):
         if not throw:
             args = StopIteration, StopIteration(*args), None
             self._message_head.unsafe_set((NULL, Value((True, args)), NULL))
 
+
+class _Pipeline(Stream):
+    @classmethod
+    def join(cls, streams):
+        # Splice the stages of already built pipelines into the new one, so
+        # that a | b | c gets the same flat pipeline as pipe(a, b, c). The
+        # links inside those pipelines are already connected and get reused
+        # as they are: the old pipelines keep reporting the stage results to
+        # them, which does no harm as each link only acts on the first one.
+        stages = []
+        links = []
+        for stream in streams:
+            if isinstance(stream, _Pipeline):
+                sub_stages = stream._streams
+                sub_links = stream._links
+            else:
+                sub_stages = (stream,)
+                sub_links = ()
+
+            if stages:
+                links.append(None)
+            stages.extend(sub_stages)
+            links.extend(sub_links)
+        return cls(tuple(stages), links)
+
+    def __init__(self, streams, links=None):
+        if links is None:
+            links = [None] * (len(streams) - 1)
+
+        self._streams = streams
+        self._links = [
+            _Link(streams[index], streams[index + 1]) if link is None else link
+            for index, link in enumerate(links)
+        ]
+        self._running = len(streams)
+        self._result = Value()
+
+        for link, old in zip(self._links, links):
+            if old is None:
+                link._connect()
+
+        for index, stream in enumerate(streams):
+            stream.result().listen(partial(self._stream_result, index))
+
+    def _stream_result(self, index, _, (throw, args)):
+        self._running -= 1
+
+        if index > 0:
+            self._links[index - 1]._right_result(throw, args)
+        if index < len(self._links):
+            self._links[index]._left_result(throw, args)
+
+        if self._running == 0:
+            self._result.unsafe_set(self._streams[-1].result().unsafe_get())
+
     def _pipe(self, messages, signals, broken):
-        self._left._pipe(messages, signals, NULL)
-        self._right._pipe(NULL, NULL, broken)
+        self._streams[0]._pipe(messages, signals, NULL)
+        self._streams[-1]._pipe(NULL, NULL, broken)
 
     def head(self):
-        return self._right.head()
+        return self._streams[-1].head()
 
     def result(self):
         return self._result
@@ -742,11 +1132,14 @@ def map(func, *args, **keys):
             yield send(result)
 
 
+# The code object shared by all @stream wrapper functions.
+_STREAM_CODE = map.func_code
+
+
 def pipe(first, *rest):
     if not rest:
         return require_stream(first)
-    cut = len(rest) // 2
-    return _PipePair(pipe(first, *rest[:cut]), pipe(*rest[cut:]))
+    return _Pipeline.join([require_stream(stream) for stream in (first,) + rest])
 
 
 next = Next
@@ -756,6 +1149,42 @@ def send(*args):
     return _Send(False, args)
 
 
+def send_many(iterable):
+    """
+    Send each item of the iterable as a separate message, in order. The
+    returned stream finishes after all the messages have been consumed.
+    The sender gets resumed only once for the whole batch.
+    """
+
+    return _SendMany([(item,) for item in iterable])
+
+
+def next_batch(max_items):
+    """
+    Wait for the next message like idiokit.next(), and return a list of it
+    and up to max_items - 1 further messages that become available during
+    the same loop iteration (e.g. sent with idiokit.send_many).
+    """
+
+    if max_items < 1:
+        raise ValueError("max_items must be at least 1")
+    return _NextBatch(max_items)
+
+
+def finished(*args):
+    """
+    Return a stream that has already finished with the given result.
+    Yielding it resumes the generator without a trip through the loop.
+    """
+
+    if not args:
+        return _FINISHED
+    return _Finished(args)
+
+
+_FINISHED = _Finished(())
+
+
 def stop(*args):
     raise StopIteration(*args)
 
@@ -764,6 +1193,438 @@ def consume():
     return map(lambda x: None)
 
 
+class Buffer(Proxy):
+    """
+    A pipe stage that lets the streams before it run ahead of the streams
+    after it. Messages get queued until the buffer holds max_items
+    messages or max_bytes bytes (the sum of len(message) for each queued
+    message, no limit when max_bytes is None). Then the buffer stops
+    reading its input until the queue has drained down to the low
+    watermark, i.e. low_water times the limits.
+
+    The messages are sent on one at a time. The byte limit is checked
+    after each batch read from the input, so it can be exceeded by the
+    messages of a single loop iteration. An
+    error from the input is raised only after the messages queued before
+    it have been delivered.
+    """
+
+    def __init__(self, max_items=1024, max_bytes=None, low_water=0.5):
+        if max_items < 1:
+            raise ValueError("max_items must be at least 1")
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError("max_bytes must be at least 1")
+        if not 0.0 <= low_water < 1.0:
+            raise ValueError("low_water must be at least 0.0 and less than 1.0")
+
+        self._max_items = max_items
+        self._max_bytes = max_bytes
+        self._low_items = int(max_items * low_water)
+        self._low_bytes = None if max_bytes is None else int(max_bytes * low_water)
+
+        self._queue = collections.deque()
+        self._depth_bytes = 0
+        self._sending = 0
+        self._sending_bytes = 0
+
+        self._finished = False
+        self._error = None
+        self._input_waiter = None
+        self._output_waiter = None
+
+        Proxy.__init__(self, pipe(self._input(), self._output()))
+
+    @property
+    def depth(self):
+        """
+        The number of messages read from the input but not yet consumed
+        from the output.
+        """
+
+        return len(self._queue) + self._sending
+
+    @property
+    def depth_bytes(self):
+        return self._depth_bytes + self._sending_bytes
+
+    def _above_high(self):
+        if self.depth >= self._max_items:
+            return True
+        return self._max_bytes is not None and self.depth_bytes >= self._max_bytes
+
+    def _above_low(self):
+        if self.depth > self._low_items:
+            return True
+        return self._max_bytes is not None and self.depth_bytes > self._low_bytes
+
+    def _wake_output(self):
+        waiter = self._output_waiter
+        if waiter is not None:
+            self._output_waiter = None
+            waiter.succeed()
+
+    def _wake_input(self):
+        waiter = self._input_waiter
+        if waiter is not None and not self._above_low():
+            self._input_waiter = None
+            waiter.succeed()
+
+    @stream
+    def _input(self):
+        try:
+            while True:
+                if self._above_high():
+                    while self._above_low():
+                        self._input_waiter = Event()
+                        yield self._input_waiter
+
+                try:
+                    items = yield next_batch(self._max_items - self.depth)
+                except StopIteration:
+                    return
+
+                self._queue.extend(items)
+                if self._max_bytes is not None:
+                    self._depth_bytes += sum(len(item) for item in items)
+                self._wake_output()
+        except:
+            self._error = sys.exc_info()
+        finally:
+            self._finished = True
+            self._input_waiter = None
+            self._wake_output()
+
+    @stream
+    def _output(self):
+        queue = self._queue
+
+        while True:
+            if queue:
+                # Hand the messages over one at a time, so that the depth
+                # stays exact while the queue drains and the input gets
+                # resumed as soon as the low watermark is reached.
+                item = queue.popleft()
+
+                self._sending = 1
+                if self._max_bytes is not None:
+                    self._sending_bytes = len(item)
+                    self._depth_bytes -= self._sending_bytes
+
+                yield send(item)
+
+                self._sending = 0
+                self._sending_bytes = 0
+                self._wake_input()
+                continue
+
+            if self._finished:
+                break
+
+            self._output_waiter = Event()
+            yield self._output_waiter
+
+        if self._error is not None:
+            exc_type, exc_value, exc_tb = self._error
+            self._error = None
+            raise exc_type, exc_value, exc_tb
+
+
+def buffer(max_items=1024, max_bytes=None, low_water=0.5):
+    """
+    Return a Buffer stage for pipes, e.g. reader() | idiokit.buffer(256) |
+    writer() lets reader() get up to 256 messages ahead of writer(). The
+    current queue size can be monitored with the .depth and .depth_bytes
+    attributes of the returned stream.
+    """
+
+    return Buffer(max_items, max_bytes, low_water)
+
+
+class _ParallelMap(Proxy):
+    def __init__(self, stream_func, concurrency, ordered):
+        self._stream_func = stream_func
+        self._concurrency = concurrency
+        self._ordered = ordered
+
+        # Finished tasks by their index in the input order (ordered) or in
+        # the completion order (unordered). The output sends them in the
+        # order of the keys.
+        self._tasks = {}
+        self._ready = {}
+        self._started = 0
+        self._completed = 0
+        self._sent = 0
+
+        self._finished = False
+        self._cancelled = False
+        self._error = None
+        self._input_waiter = None
+        self._output_waiter = None
+
+        Proxy.__init__(self, pipe(self._input(), self._output()))
+
+    def _in_flight(self):
+        return self._started - self._sent
+
+    def _wake_output(self):
+        waiter = self._output_waiter
+        if waiter is not None:
+            self._output_waiter = None
+            waiter.succeed()
+
+    def _wake_input(self):
+        waiter = self._input_waiter
+        if waiter is not None and self._in_flight() < self._concurrency:
+            self._input_waiter = None
+            waiter.succeed()
+
+    def _start_task(self, item):
+        task = require_stream(self._stream_func(item))
+
+        index = self._started
+        self._started += 1
+        self._tasks[index] = task
+        task.result().listen(partial(self._task_done, index))
+
+    def _task_done(self, index, _, result):
+        if self._tasks.pop(index, None) is None:
+            return
+
+        if self._ordered:
+            self._ready[index] = result
+        else:
+            self._ready[self._completed] = result
+        self._completed += 1
+        self._wake_output()
+
+    def _cancel(self):
+        self._cancelled = True
+
+        tasks = self._tasks
+        self._tasks = {}
+        for task in tasks.itervalues():
+            task.throw(BrokenPipe())
+
+    @stream
+    def _input(self):
+        try:
+            while not self._cancelled:
+                while self._in_flight() >= self._concurrency:
+                    self._input_waiter = Event()
+                    yield self._input_waiter
+
+                try:
+                    items = yield next_batch(self._concurrency - self._in_flight())
+                except StopIteration:
+                    return
+
+                for item in items:
+                    if self._cancelled:
+                        return
+                    self._start_task(item)
+        except:
+            self._error = sys.exc_info()
+        finally:
+            self._finished = True
+            self._input_waiter = None
+            self._wake_output()
+
+    @stream
+    def _output(self):
+        ready = self._ready
+        position = 0
+
+        try:
+            while True:
+                batch = []
+                error = None
+                while position in ready:
+                    throw, args = ready.pop(position)
+                    position += 1
+                    if throw:
+                        error = args
+                        break
+                    batch.append(peel_args(args))
+
+                if batch:
+                    yield send_many(batch)
+                    self._sent += len(batch)
+                    self._wake_input()
+
+                if error is not None:
+                    exc_type, exc_value, exc_tb = fill_exc(error)
+                    raise exc_type, exc_value, exc_tb
+
+                if batch:
+                    continue
+
+                if self._finished and position == self._started:
+                    break
+
+                self._output_waiter = Event()
+                yield self._output_waiter
+        finally:
+            self._cancel()
+
+        if self._error is not None:
+            exc_type, exc_value, exc_tb = self._error
+            self._error = None
+            raise exc_type, exc_value, exc_tb
+
+
+def parallel_map(stream_func, concurrency=10, ordered=True):
+    """
+    Call stream_func(item) for each message and send out the results of
+    the returned streams. Up to concurrency streams are kept running at
+    the same time. When ordered is True the results are sent in the
+    order of the input messages, otherwise in the order the streams
+    finish. In the ordered mode finished results that are waiting for
+    an earlier one also count towards the concurrency.
+
+    A failing stream makes the whole parallel map fail with its error,
+    and the streams still running get a BrokenPipe thrown into them.
+    """
+
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    return _ParallelMap(stream_func, concurrency, ordered)
+
+
+class _Window(Proxy):
+    def __init__(self, max_items, max_bytes, max_delay):
+        self._max_items = max_items
+        self._max_bytes = max_bytes
+        self._max_delay = max_delay
+
+        self._window = []
+        self._window_bytes = 0
+        self._timer = None
+        self._ready = collections.deque()
+
+        self._finished = False
+        self._stop_args = ()
+        self._error = None
+        self._input_waiter = None
+        self._output_waiter = None
+
+        Proxy.__init__(self, pipe(self._input(), self._output()))
+
+    def _wake_output(self):
+        waiter = self._output_waiter
+        if waiter is not None:
+            self._output_waiter = None
+            waiter.succeed()
+
+    def _wake_input(self):
+        waiter = self._input_waiter
+        if waiter is not None:
+            self._input_waiter = None
+            waiter.succeed()
+
+    def _close_window(self):
+        if self._timer is not None:
+            cancel(self._timer)
+            self._timer = None
+
+        if self._window:
+            self._ready.append(self._window)
+            self._window = []
+            self._window_bytes = 0
+            self._wake_output()
+
+    def _add(self, item):
+        self._window.append(item)
+        if self._max_bytes is not None:
+            self._window_bytes += len(item)
+
+        if self._max_items is not None and len(self._window) >= self._max_items:
+            self._close_window()
+        elif self._max_bytes is not None and self._window_bytes >= self._max_bytes:
+            self._close_window()
+        elif self._timer is None and self._max_delay is not None:
+            self._timer = sleep(self._max_delay, self._expire)
+
+    def _expire(self):
+        self._timer = None
+        self._close_window()
+
+    @stream
+    def _input(self):
+        try:
+            while True:
+                # Keep at most one finished window waiting for the output.
+                while self._ready:
+                    self._input_waiter = Event()
+                    yield self._input_waiter
+
+                if self._max_items is None:
+                    limit = 1024
+                else:
+                    limit = self._max_items - len(self._window)
+
+                try:
+                    items = yield next_batch(limit)
+                except StopIteration as stop:
+                    self._stop_args = stop.args
+                    return
+
+                for item in items:
+                    self._add(item)
+        except:
+            self._error = sys.exc_info()
+        finally:
+            self._close_window()
+            self._finished = True
+            self._input_waiter = None
+            self._wake_output()
+
+    @stream
+    def _output(self):
+        ready = self._ready
+
+        while True:
+            if ready:
+                items = ready.popleft()
+                self._wake_input()
+                yield send(items)
+                continue
+
+            if self._finished:
+                break
+
+            self._output_waiter = Event()
+            yield self._output_waiter
+
+        if self._error is not None:
+            exc_type, exc_value, exc_tb = self._error
+            self._error = None
+            raise exc_type, exc_value, exc_tb
+        stop(*self._stop_args)
+
+
+def window(max_items=None, max_bytes=None, max_delay=None):
+    """
+    Collect messages into lists ("windows") and send out each list as a
+    single message. A window is sent when it has max_items messages,
+    when the lengths of its messages add up to max_bytes or more, or
+    max_delay seconds after its first message arrived, whichever comes
+    first. Leaving a limit to None disables it. A max_delay of 0.0 sends
+    the messages that arrive during the same loop iteration together.
+
+    The remaining messages are sent as a last window when the input
+    finishes. The stream finishes with the input's result, or raises its
+    error after the earlier windows have been sent.
+    """
+
+    if max_items is not None and max_items < 1:
+        raise ValueError("max_items must be at least 1")
+    if max_bytes is not None and max_bytes < 1:
+        raise ValueError("max_bytes must be at least 1")
+    if max_delay is not None and max_delay < 0.0:
+        raise ValueError("max_delay must be at least 0.0")
+    return _Window(max_items, max_bytes, max_delay)
+
+
 class Signal(Exception):
     _signames = None
 
@@ -819,24 +1680,57 @@ class Signal(Exception):
         return result
 
 
+@stream
+def watch_signals(*signums):
+    """
+    Send out the signal number each time one of the given signals gets
+    caught. The signals are caught for as long as the stream runs.
+    """
+
+    caught = collections.deque()
+    waiters = []
+
+    def handle_signal(signum):
+        caught.append(signum)
+        while waiters:
+            waiters.pop().succeed()
+
+    added = []
+    try:
+        for signum in set(signums):
+            add_signal_handler(signum, handle_signal)
+            added.append(signum)
+
+        while True:
+            if caught:
+                items = list(caught)
+                caught.clear()
+                yield send_many(items)
+            else:
+                waiter = Event()
+                waiters.append(waiter)
+                yield waiter
+    finally:
+        for signum in added:
+            remove_signal_handler(signum, handle_signal)
+
+
 def main_loop(main, catch_signals=(signal.SIGINT, signal.SIGTERM, signal.SIGUSR1, signal.SIGUSR2)):
-    def handle_signal(signum, _):
-        thread = threading.Thread(target=asap, args=[main.throw, Signal(signum)])
-        thread.daemon = True
-        thread.start()
+    def handle_signal(signum):
+        main.throw(Signal(signum))
 
-    previous_signal_handlers = []
+    added = []
     try:
         for signum in set(catch_signals):
-            previous_signal_handlers.append((signum, signal.getsignal(signum)))
-            signal.signal(signum, handle_signal)
+            add_signal_handler(signum, handle_signal)
+            added.append(signum)
 
         is_set = main.result().unsafe_is_set
         while not is_set():
             iterate()
     finally:
-        for signum, handler in previous_signal_handlers:
-            signal.signal(signum, handler)
+        for signum in added:
+            remove_signal_handler(signum, handle_signal)
 
     throw, args = main.result().unsafe_get()
     if throw:
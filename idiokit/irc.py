@@ -141,13 +141,15 @@ def connect(
 def _main(sock, nick, parser, ping_interval=10.0, timeout=30.0):
     @idiokit.stream
     def _ping():
+        # The keepalive timers don't need to be precise, so let them be
+        # coalesced with other timers.
         while True:
             try:
-                _, command, params = yield timer.timeout(ping_interval, idiokit.next())
+                _, command, params = yield timer.timeout(ping_interval, idiokit.next(), slack=ping_interval / 10.0)
             except timer.Timeout:
                 yield idiokit.send("PING", nick)
                 try:
-                    _, command, params = yield timer.timeout(timeout, idiokit.next())
+                    _, command, params = yield timer.timeout(timeout, idiokit.next(), slack=timeout / 10.0)
                 except timer.Timeout:
                     raise IRCError("PING timeout")
 
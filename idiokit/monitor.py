@@ -0,0 +1,343 @@
+from __future__ import absolute_import
+
+import sys
+import logging
+import threading
+import traceback
+import collections
+
+from . import idiokit, _selectloop, _time
+from ._selectloop import IterationStats, add_stats_hook, remove_stats_hook
+
+
+__all__ = [
+    "IterationStats",
+    "add_stats_hook",
+    "remove_stats_hook",
+    "Totals",
+    "Stall",
+    "StallWatchdog",
+    "watch_stalls",
+    "StreamInfo",
+    "track_streams",
+    "untrack_streams",
+    "running_streams",
+    "format_streams",
+    "dump_streams"
+]
+
+
+class Totals(object):
+    r"""
+    A stats hook that sums up the per-iteration stats of the loop, e.g.
+    for periodic reporting.
+
+    >>> totals = Totals()
+    >>> totals(IterationStats(3, 0.5, 0.25, 10, 2, 1, 5))
+    >>> totals(IterationStats(1, 0.5, 0.25, 12, 4, 0, 0))
+    >>> result = totals.reset()
+    >>> result["iterations"], result["callbacks"], result["remote_calls"]
+    (2, 4, 1)
+    >>> round(result["saturation"], 3)
+    0.333
+    >>> result["timers"], result["fds"]
+    (12, 4)
+    >>> result["over_budget"], result["max_deferred"]
+    (1, 5)
+    >>> totals.reset()["iterations"]
+    0
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self._iterations = 0
+        self._callbacks = 0
+        self._wait_time = 0.0
+        self._run_time = 0.0
+        self._remote_calls = 0
+        self._max_run_time = 0.0
+        self._timers = 0
+        self._fds = 0
+        self._over_budget = 0
+        self._max_deferred = 0
+
+    def __call__(self, stats):
+        self._iterations += 1
+        self._callbacks += stats.callbacks
+        self._wait_time += stats.wait_time
+        self._run_time += stats.run_time
+        self._remote_calls += stats.remote_calls
+        self._max_run_time = max(self._max_run_time, stats.run_time)
+        self._timers = stats.timers
+        self._fds = stats.fds
+        if stats.deferred:
+            self._over_budget += 1
+            self._max_deferred = max(self._max_deferred, stats.deferred)
+
+    def reset(self):
+        """
+        Return the totals collected since the previous reset as a dict,
+        and start collecting from scratch. The "saturation" item is the
+        fraction of time the loop spent running callbacks instead of
+        waiting, "timers" and "fds" are the latest values seen.
+        "over_budget" counts the iterations that ran out of their
+        callback budget, and "max_deferred" is the largest number of
+        callbacks deferred by one of them.
+        """
+
+        busy = self._wait_time + self._run_time
+        result = {
+            "iterations": self._iterations,
+            "callbacks": self._callbacks,
+            "wait_time": self._wait_time,
+            "run_time": self._run_time,
+            "max_run_time": self._max_run_time,
+            "saturation": self._run_time / busy if busy > 0.0 else 0.0,
+            "remote_calls": self._remote_calls,
+            "timers": self._timers,
+            "fds": self._fds,
+            "over_budget": self._over_budget,
+            "max_deferred": self._max_deferred
+        }
+        self._reset()
+        return result
+
+
+Stall = collections.namedtuple("Stall", ["duration", "callback", "stream", "stack"])
+
+
+def _describe_code(code):
+    return "{0} ({1}:{2})".format(code.co_name, code.co_filename, code.co_firstlineno)
+
+
+def _describe_generator(gen):
+    return _describe_code(gen.gi_code)
+
+
+def _find_stream(frame):
+    while frame is not None:
+        if frame.f_code is idiokit._NEXT_CODE:
+            stream = frame.f_locals.get("self", None)
+            gen = getattr(stream, "_gen", None)
+            if gen is not None:
+                return _describe_generator(gen)
+        frame = frame.f_back
+    return None
+
+
+def _log_stall(stall):
+    logging.getLogger("idiokit.monitor").warning(
+        "loop stalled for %.3f seconds in %r (stream %s)\n%s",
+        stall.duration,
+        stall.callback,
+        stall.stream,
+        "".join(stall.stack).rstrip()
+    )
+
+
+class StallWatchdog(object):
+    """
+    A watchdog thread that notices when a single loop callback has been
+    running for longer than the given threshold (in seconds). Each stall
+    gets reported once by calling report(stall) from the watchdog thread
+    with a Stall instance containing the loop thread's stack at the time
+    of detection and the generator function of the stream being advanced
+    (if any). By default stalls are logged to the "idiokit.monitor"
+    logger.
+    """
+
+    _monotonic = staticmethod(_time.monotonic)
+    _current_frames = staticmethod(sys._current_frames)
+
+    def __init__(self, threshold=1.0, report=_log_stall, loop=_selectloop.global_select_loop):
+        self.threshold = threshold
+
+        self._report = report
+        self._loop = loop
+        self._stopped = threading.Event()
+        self._thread = None
+
+        self._sequence = None
+        self._since = None
+        self._reported = False
+
+    def start(self):
+        if self._thread is not None:
+            raise RuntimeError("watchdog already started")
+
+        self._loop.enable_call_tracking()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is None or self._stopped.is_set():
+            return
+
+        self._stopped.set()
+        self._thread.join()
+        self._loop.disable_call_tracking()
+
+    def _run(self):
+        interval = max(self.threshold / 4.0, 0.001)
+        while True:
+            self._stopped.wait(interval)
+            if self._stopped.is_set():
+                return
+            self.check()
+
+    def check(self):
+        active = self._loop.active_call()
+        now = self._monotonic()
+
+        if active is None or active[0] != self._sequence:
+            self._sequence = None if active is None else active[0]
+            self._since = now
+            self._reported = False
+            return
+
+        duration = now - self._since
+        if self._reported or duration < self.threshold:
+            return
+        self._reported = True
+
+        _, ident, callback, _ = active
+        frame = self._current_frames().get(ident, None)
+        try:
+            stack = traceback.format_stack(frame) if frame is not None else []
+            stream = _find_stream(frame)
+        finally:
+            frame = None
+
+        self._report(Stall(duration, callback, stream, stack))
+
+
+def watch_stalls(threshold=1.0, report=_log_stall):
+    """
+    Start and return a StallWatchdog for the global loop. Call .stop() for
+    the returned watchdog to stop it.
+    """
+
+    return StallWatchdog(threshold, report).start()
+
+
+StreamInfo = collections.namedtuple("StreamInfo", [
+    "stream",
+    "function",
+    "site",
+    "age",
+    "yield_site",
+    "waiting_on"
+])
+
+
+def track_streams():
+    """
+    Start recording the creation time and creation site of new streams.
+    Streams created before tracking was started report None for both.
+    Calls nest, each call should be paired with untrack_streams().
+    """
+
+    idiokit.GeneratorBasedStream._tracking += 1
+
+
+def untrack_streams():
+    if idiokit.GeneratorBasedStream._tracking <= 0:
+        raise RuntimeError("stream tracking not enabled")
+    idiokit.GeneratorBasedStream._tracking -= 1
+
+
+def running_streams():
+    """
+    Return a StreamInfo for each generator based stream that has been
+    started but has not finished yet.
+    """
+
+    infos = []
+    for stream in idiokit.GeneratorBasedStream.running():
+        function = stream.function()
+        if function is None:
+            continue
+
+        infos.append(StreamInfo(
+            stream,
+            function,
+            stream.creation_site(),
+            stream.age(),
+            stream.yield_site(),
+            stream.waiting_on()
+        ))
+    return infos
+
+
+def _describe_stream(stream):
+    if stream is None:
+        return "nothing"
+    if isinstance(stream, idiokit.GeneratorBasedStream):
+        function = stream.function()
+        if function is not None:
+            return _describe_code(function)
+    return type(stream).__name__
+
+
+def _format_site(site):
+    if site is None:
+        return "unknown"
+    if len(site) == 3:
+        return "{0}:{1} in {2}".format(*site)
+    return "{0}:{1}".format(*site)
+
+
+def _count_lines(counts, prefix):
+    items = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    return ["    {0} {1} ({2})".format(prefix, key, count) for key, count in items]
+
+
+def format_streams(infos=None):
+    """
+    Return a report of running streams grouped by their generator
+    functions, largest groups first. For each group the report lists
+    the age of the oldest stream, where the streams were created and what
+    they are currently waiting on.
+    """
+
+    if infos is None:
+        infos = running_streams()
+
+    groups = collections.defaultdict(list)
+    for info in infos:
+        groups[info.function].append(info)
+
+    lines = []
+    for function, group in sorted(groups.items(), key=lambda item: -len(item[1])):
+        ages = [info.age for info in group if info.age is not None]
+        header = "{0} x {1}".format(len(group), _describe_code(function))
+        if ages:
+            header += ", oldest {0:.1f} seconds".format(max(ages))
+        lines.append(header)
+
+        sites = collections.defaultdict(int)
+        waits = collections.defaultdict(int)
+        for info in group:
+            sites[_format_site(info.site)] += 1
+            waits["{0} on {1}".format(_format_site(info.yield_site), _describe_stream(info.waiting_on))] += 1
+        lines.extend(_count_lines(sites, "created at"))
+        lines.extend(_count_lines(waits, "waiting at"))
+
+    return "\n".join(lines)
+
+
+def dump_streams(fileobj=None):
+    """
+    Write the report returned by format_streams() to the given file
+    object (sys.stderr by default).
+    """
+
+    if fileobj is None:
+        fileobj = sys.stderr
+    report = format_streams()
+    if report:
+        fileobj.write(report + "\n")
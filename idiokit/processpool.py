@@ -0,0 +1,253 @@
+from __future__ import absolute_import
+
+import os
+import sys
+import signal
+import cPickle
+import threading
+import collections
+import multiprocessing
+
+from . import idiokit, timer, _time, _selectloop
+
+
+def _call_many(func, args_list):
+    return [func(*args) for args in args_list]
+
+
+try:
+    _MAXFD = os.sysconf("SC_OPEN_MAX")
+except (AttributeError, ValueError, OSError):
+    _MAXFD = 256
+
+
+def _open_fds():
+    try:
+        return [int(x) for x in os.listdir("/proc/self/fd")]
+    except OSError:
+        return xrange(_MAXFD)
+
+
+def _close_fds(keep):
+    # The workers are forked from a thread of a running process, so they
+    # start with copies of all its descriptors: sockets, the select loop's
+    # epoll and wakeup descriptors, the signal pipe and so on. Close them,
+    # like subprocess does with close_fds=True, so that e.g. a socket the
+    # parent closes really gets closed.
+    for fd in _open_fds():
+        if fd <= 2 or fd in keep:
+            continue
+
+        try:
+            os.close(fd)
+        except OSError:
+            pass
+
+
+def _worker(conn):
+    # The parent process handles the keyboard interrupts and tells the
+    # workers to stop when the pool no longer needs them. Drop the signal
+    # handlers inherited from idiokit.main_loop so that a plain SIGTERM
+    # still terminates the worker.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for signum in (signal.SIGTERM, signal.SIGUSR1, signal.SIGUSR2):
+        signal.signal(signum, signal.SIG_DFL)
+    signal.set_wakeup_fd(-1)
+
+    _close_fds(set([conn.fileno()]))
+
+    while True:
+        try:
+            item = conn.recv()
+        except EOFError:
+            return
+        if item is None:
+            return
+
+        func, args, keys = item
+        try:
+            result = True, func(*args, **keys)
+        except Exception as exc:
+            result = False, exc
+
+        try:
+            conn.send(result)
+        except Exception as exc:
+            conn.send((False, ProcessPoolError("could not send the result: {0!r}".format(exc))))
+
+
+class ProcessPoolError(Exception):
+    pass
+
+
+class ProcessPool(object):
+    _Event = idiokit.Event
+    _sleep = staticmethod(timer.sleep)
+    _deque = staticmethod(collections.deque)
+    _Thread = staticmethod(threading.Thread)
+    _Lock = staticmethod(threading.Lock)
+    _Process = staticmethod(multiprocessing.Process)
+    _Pipe = staticmethod(multiprocessing.Pipe)
+    _deliver = staticmethod(_selectloop.deliver)
+    _monotonic = _time.monotonic
+
+    def __init__(self, max_workers=None, idle_time=5.0):
+        if max_workers is None:
+            max_workers = multiprocessing.cpu_count()
+
+        self.max_workers = max_workers
+        self.idle_time = idle_time
+        self.supervisor = None
+        self.alive = 0
+        self.workers = self._deque()
+        self.jobs = self._deque()
+
+    @idiokit.stream
+    def run(self, func, *args, **keys):
+        event = self._Event()
+        self._submit(event, (func, args, keys))
+
+        result = yield event
+        idiokit.stop(result)
+
+    @idiokit.stream
+    def map(self, func, iterable, chunk_size=1):
+        """
+        Call func(*args) for each args tuple in iterable and return the
+        results as a list. The calls are sent to the workers chunk_size
+        calls at a time, so that each chunk costs only one round trip.
+        """
+
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+
+        events = []
+        chunk = []
+        for args in iterable:
+            chunk.append(tuple(args))
+            if len(chunk) >= chunk_size:
+                events.append(self._submit_chunk(func, chunk))
+                chunk = []
+        if chunk:
+            events.append(self._submit_chunk(func, chunk))
+
+        results = []
+        for event in events:
+            results.extend((yield event))
+        idiokit.stop(results)
+
+    def _submit_chunk(self, func, chunk):
+        event = self._Event()
+        self._submit(event, (_call_many, (func, chunk), {}))
+        return event
+
+    def _submit(self, event, job):
+        if self.workers:
+            _, lock, queue = self.workers.pop()
+            queue.append((event, job))
+            lock.release()
+        elif self.alive < self.max_workers:
+            lock = self._Lock()
+            queue = [(event, job)]
+
+            thread = self._Thread(target=self._thread, args=(lock, queue))
+            thread.daemon = True
+            thread.start()
+
+            self.alive += 1
+        else:
+            self.jobs.append((event, job))
+
+        if self.supervisor is None:
+            self.supervisor = self._supervisor()
+
+    @idiokit.stream
+    def _supervisor(self):
+        while True:
+            while True:
+                yield self._sleep(self.idle_time / 2.0, slack=self.idle_time / 4.0)
+                if self.alive == 0:
+                    break
+
+                cut = self._monotonic() - self.idle_time
+                while self.workers and self.workers[0][0] < cut:
+                    _, lock, queue = self.workers.popleft()
+                    queue.append(None)
+                    lock.release()
+
+            yield self._sleep(self.idle_time, slack=self.idle_time / 4.0)
+            if self.alive == 0:
+                self.supervisor = None
+                return
+
+    def _release(self, lock, queue):
+        if self.jobs:
+            queue.append(self.jobs.popleft())
+            lock.release()
+        else:
+            self.workers.append((self._monotonic(), lock, queue))
+
+    def _complete(self, lock, queue, event, success, result):
+        self._release(lock, queue)
+        if success:
+            event.succeed(result)
+        else:
+            event.fail(type(result), result, None)
+
+    def _finish(self):
+        self.alive -= 1
+
+        # Jobs may have been queued for a worker that has just died.
+        if self.jobs and self.alive < self.max_workers:
+            event, job = self.jobs.popleft()
+            self._submit(event, job)
+
+    def _thread(self, lock, queue):
+        # Each worker process is driven by a thread of its own that passes
+        # the jobs and results along. The results are delivered to the
+        # loop with deliver, which wakes the loop through its wakeup pipe.
+        try:
+            conn, child_conn = self._Pipe()
+            process = self._Process(target=_worker, args=(child_conn,))
+            process.daemon = True
+            process.start()
+            child_conn.close()
+        except Exception:
+            event, _ = queue.pop()
+            self._deliver(event.fail, *sys.exc_info())
+            self._deliver(self._finish)
+            return
+
+        try:
+            while True:
+                lock.acquire()
+
+                item = queue.pop()
+                if item is None:
+                    conn.send(None)
+                    return
+
+                event, job = item
+                try:
+                    data = cPickle.dumps(job, cPickle.HIGHEST_PROTOCOL)
+                except Exception:
+                    self._deliver(self._complete, lock, queue, event, False, sys.exc_info()[1])
+                    continue
+
+                try:
+                    conn.send_bytes(data)
+                    success, result = conn.recv()
+                except Exception:
+                    self._deliver(event.fail, *sys.exc_info())
+                    return
+
+                self._deliver(self._complete, lock, queue, event, success, result)
+        finally:
+            conn.close()
+            process.join()
+            self._deliver(self._finish)
+
+
+global_processpool = ProcessPool()
+process = global_processpool.run
+process_map = global_processpool.map
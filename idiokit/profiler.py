@@ -0,0 +1,150 @@
+from __future__ import absolute_import
+
+import os
+import sys
+import threading
+import collections
+
+from . import idiokit, _selectloop
+
+
+def _label(code):
+    """
+    Return a flame graph friendly label for a code object.
+
+    >>> def func():
+    ...     pass
+    >>> _label(func.func_code)
+    'func (<doctest idiokit.profiler._label[0]>:1)'
+    """
+
+    filename = os.path.basename(code.co_filename)
+    label = "{0} ({1}:{2})".format(code.co_name, filename, code.co_firstlineno)
+    return label.replace(";", ":")
+
+
+class Profiler(object):
+    """
+    A sampling profiler for idiokit programs. A background thread samples
+    the loop thread's stack at the given interval (in seconds). Samples
+    taken while a stream's generator is being advanced are attributed to
+    the stream's logical path, i.e. the generator functions of the streams
+    that created it, followed by the Python frames of the generator
+    itself. Other samples are attributed to "[wait]" (the loop is waiting
+    for I/O or timers) or "[idiokit]" (internal bookkeeping).
+
+    Only streams created while the profiler is running get their full
+    logical path, earlier streams are attributed to their own generator
+    function only.
+    """
+
+    WAIT = "[wait]"
+    INTERNAL = "[idiokit]"
+
+    _current_frames = staticmethod(sys._current_frames)
+
+    def __init__(self, interval=0.005, loop=_selectloop.global_select_loop):
+        self.interval = interval
+
+        self._loop = loop
+        self._stopped = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._counts = collections.defaultdict(int)
+        self._labels = {}
+
+        self._wait_code = loop._wait.im_func.func_code
+
+    def start(self):
+        if self._thread is not None:
+            raise RuntimeError("profiler already started")
+
+        idiokit.GeneratorBasedStream._tracing += 1
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is None or self._stopped.is_set():
+            return
+
+        self._stopped.set()
+        self._thread.join()
+        idiokit.GeneratorBasedStream._tracing -= 1
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.stop()
+
+    def _run(self):
+        while True:
+            self._stopped.wait(self.interval)
+            if self._stopped.is_set():
+                return
+            self.sample()
+
+    def _get_label(self, code):
+        label = self._labels.get(code, None)
+        if label is None:
+            label = _label(code)
+            self._labels[code] = label
+        return label
+
+    def sample(self):
+        ident = self._loop.thread_ident()
+        if ident is None:
+            return
+
+        frame = self._current_frames().get(ident, None)
+        try:
+            stack = self._stack(frame)
+        finally:
+            frame = None
+
+        if stack is not None:
+            with self._lock:
+                self._counts[stack] += 1
+
+    def _stack(self, frame):
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            if code is idiokit._NEXT_CODE:
+                stream = frame.f_locals.get("self", None)
+                break
+            if code is self._wait_code:
+                return (self.WAIT,)
+            frames.append(code)
+            frame = frame.f_back
+        else:
+            return None if not frames else (self.INTERNAL,)
+
+        if stream is None:
+            return (self.INTERNAL,)
+
+        path = stream.path()
+        frames.reverse()
+        if frames and path and frames[0] is path[-1]:
+            frames.pop(0)
+        return tuple(self._get_label(code) for code in path + tuple(frames))
+
+    def collapsed(self):
+        """
+        Return the samples in the "collapsed stack" format used by flame
+        graph tools: one "frame;frame;frame count" line per unique stack.
+        """
+
+        with self._lock:
+            items = self._counts.items()
+        return sorted(";".join(stack) + " " + str(count) for stack, count in items)
+
+    def write(self, fileobj):
+        for line in self.collapsed():
+            fileobj.write(line + "\n")
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
@@ -4,7 +4,8 @@ from functools import partial
 from select import select as _native_select
 
 from . import idiokit
-from ._selectloop import cancel as selectloop_cancel, select as selectloop_select
+from ._selectloop import cancel as selectloop_cancel, select as selectloop_select, wait as selectloop_wait
+from ._selectloop import closing as selectloop_closing
 
 
 def _handle(has_error, rfds, wfds, xfds, event):
@@ -21,8 +22,32 @@ def _cancel(node, _, __):
     selectloop_cancel(node)
 
 
-def select(read, write, error, timeout=None):
+def _select(selectloop_func, read, write, error, timeout):
     event = idiokit.Event()
-    node = selectloop_select(read, write, error, timeout, _handle, event)
+    node = selectloop_func(read, write, error, timeout, _handle, event)
     event.result().listen(partial(_cancel, node))
     return event
+
+
+def select(read, write, error, timeout=None):
+    return _select(selectloop_select, read, write, error, timeout)
+
+
+def wait(read, write, error, timeout=None):
+    """
+    Like select(...), but always wait for the loop to report readiness
+    instead of checking the descriptors first. Use this right after an
+    operation has failed with EAGAIN, when the check would be wasted.
+    """
+
+    return _select(selectloop_wait, read, write, error, timeout)
+
+
+def closing(fd):
+    """
+    Make the pending select(...) and wait(...) calls for fd fail, as they
+    would for a closed descriptor. Call this right before closing a file
+    object or descriptor that other streams may be waiting for.
+    """
+
+    selectloop_closing(fd)
@@ -6,7 +6,7 @@ import errno
 import contextlib
 import socket as _socket
 
-from . import idiokit, select, timer
+from . import idiokit, select
 
 # Import constants from the standard socket module.
 for _name in getattr(_socket, "__all__", dir(_socket)):
@@ -54,14 +54,16 @@ def countdown(timeout):
     prev = time.time()
     yield max(timeout, 0.0)
 
-    while True:
+    # The callers try their operation before waiting, so the loop goes on
+    # for one more round after the time has run out. That way an operation
+    # that became possible during the last wait still gets its chance.
+    while timeout > 0:
         now = time.time()
         timeout -= max(now - prev, 0.0)
-        if timeout <= 0:
-            raise SocketTimeout("timed out")
 
         prev = now
         yield max(timeout, 0.0)
+    raise SocketTimeout("timed out")
 
 
 def check_sendable_type(value):
@@ -144,28 +146,28 @@ class _Socket(object):
 
     @idiokit.stream
     def getpeername(self, *args, **keys):
-        yield timer.sleep(0.0)
+        yield idiokit.finished()
 
         with wrapped_socket_errors():
             idiokit.stop(self._socket.getpeername(*args, **keys))
 
     @idiokit.stream
     def getsockname(self, *args, **keys):
-        yield timer.sleep(0.0)
+        yield idiokit.finished()
 
         with wrapped_socket_errors():
             idiokit.stop(self._socket.getsockname(*args, **keys))
 
     @idiokit.stream
     def bind(self, address):
-        yield timer.sleep(0.0)
+        yield idiokit.finished()
 
         with wrapped_socket_errors():
             self._socket.bind(address)
 
     @idiokit.stream
     def listen(self, backlog):
-        yield timer.sleep(0.0)
+        yield idiokit.finished()
 
         with wrapped_socket_errors():
             self._socket.listen(backlog)
@@ -175,25 +177,25 @@ class _Socket(object):
         timeout = _resolve_timeout(self, timeout)
         with wrapped_socket_errors():
             for timeout in countdown(timeout):
-                yield select.select((self._socket,), (), (), timeout)
-
                 result = _wrapped_call(None, self._socket.accept)
                 if result is not None:
                     socket, address = result
                     idiokit.stop(_Socket(socket), address)
 
+                yield select.wait((self._socket,), (), (), timeout)
+
     @idiokit.stream
     def connect(self, address, timeout=_DEFAULT_TIMEOUT):
         timeout = _resolve_timeout(self, timeout)
 
-        yield timer.sleep(0.0)
+        yield idiokit.finished()
 
         for timeout in countdown(timeout):
             with wrapped_socket_errors():
                 code = self._socket.connect_ex(address)
 
             if code in (errno.EALREADY, errno.EINPROGRESS):
-                yield select.select((), (self._socket,), (), timeout)
+                yield select.wait((), (self._socket,), (), timeout)
                 continue
             if code in (0, errno.EISCONN):
                 return
@@ -201,15 +203,16 @@ class _Socket(object):
 
     @idiokit.stream
     def shutdown(self, how):
-        yield timer.sleep(0.0)
+        yield idiokit.finished()
 
         with wrapped_socket_errors():
             self._socket.shutdown(how)
 
     @idiokit.stream
     def close(self):
-        yield timer.sleep(0.0)
+        yield idiokit.finished()
 
+        select.closing(self._socket)
         with wrapped_socket_errors():
             self._socket.close()
 
@@ -217,32 +220,32 @@ class _Socket(object):
     def recv(self, bufsize, flags=0, timeout=_DEFAULT_TIMEOUT):
         timeout = _resolve_timeout(self, timeout)
         if bufsize <= 0:
-            yield timer.sleep(0.0)
+            yield idiokit.finished()
             idiokit.stop("")
 
         with wrapped_socket_errors():
             for timeout in countdown(timeout):
-                yield select.select((self._socket,), (), (), timeout)
-
                 result = _wrapped_call(None, self._socket.recv, bufsize, flags)
                 if result is not None:
                     idiokit.stop(result)
 
+                yield select.wait((self._socket,), (), (), timeout)
+
     @idiokit.stream
     def recvfrom(self, bufsize, flags=0, timeout=_DEFAULT_TIMEOUT):
         timeout = _resolve_timeout(self, timeout)
         if bufsize <= 0:
-            yield timer.sleep(0.0)
+            yield idiokit.finished()
             idiokit.stop("")
 
         with wrapped_socket_errors():
             for timeout in countdown(timeout):
-                yield select.select((self._socket,), (), (), timeout)
-
                 result = _wrapped_call(None, self._socket.recvfrom, bufsize, flags)
                 if result is not None:
                     idiokit.stop(result)
 
+                yield select.wait((self._socket,), (), (), timeout)
+
     @idiokit.stream
     def send(self, data, flags=0, timeout=_DEFAULT_TIMEOUT):
         check_sendable_type(data)
@@ -250,12 +253,12 @@ class _Socket(object):
 
         with wrapped_socket_errors():
             for timeout in countdown(timeout):
-                yield select.select((), (self._socket,), (), timeout)
-
                 count = _wrapped_call(None, self._socket.send, data, flags)
                 if count is not None:
                     idiokit.stop(count)
 
+                yield select.wait((), (self._socket,), (), timeout)
+
     @idiokit.stream
     def sendall(self, data, flags=0, timeout=_DEFAULT_TIMEOUT):
         check_sendable_type(data)
@@ -265,12 +268,12 @@ class _Socket(object):
         length = len(data)
         with wrapped_socket_errors():
             for timeout in countdown(timeout):
-                yield select.select((), (self._socket,), (), timeout)
-
                 offset += _wrapped_call(0, self._socket.send, buffer(data, offset), flags)
                 if offset >= length:
                     break
 
+                yield select.wait((), (self._socket,), (), timeout)
+
     @idiokit.stream
     def sendto(self, data, *args, **keys):
         check_sendable_type(data)
@@ -283,15 +286,15 @@ class _Socket(object):
 
         with wrapped_socket_errors():
             for timeout in countdown(timeout):
-                yield select.select((), (self._socket,), (), timeout)
-
                 count = _wrapped_call(None, self._socket.sendto, data, flags, address)
                 if count is not None:
                     idiokit.stop(count)
 
+                yield select.wait((), (self._socket,), (), timeout)
+
     @idiokit.stream
     def getsockopt(self, *args, **keys):
-        yield timer.sleep(0)
+        yield idiokit.finished()
 
         with wrapped_socket_errors():
             result = self._socket.getsockopt(*args, **keys)
@@ -299,7 +302,7 @@ class _Socket(object):
 
     @idiokit.stream
     def setsockopt(self, *args, **keys):
-        yield timer.sleep(0)
+        yield idiokit.finished()
 
         with wrapped_socket_errors():
             result = self._socket.setsockopt(*args, **keys)
@@ -6,7 +6,7 @@ import platform
 import contextlib
 import ssl as _ssl
 
-from . import idiokit, select, socket, timer
+from . import idiokit, select, socket
 
 
 class SSLError(socket.SocketError):
@@ -145,9 +145,9 @@ def _wrapped(ssl, timeout, func, *args, **keys):
                 result = func(*args, **keys)
             except _ssl.SSLError as err:
                 if err.errno == _ssl.SSL_ERROR_WANT_READ:
-                    yield select.select((ssl,), (), (), timeout)
+                    yield select.wait((ssl,), (), (), timeout)
                 elif err.errno == _ssl.SSL_ERROR_WANT_WRITE:
-                    yield select.select((), (ssl,), (), timeout)
+                    yield select.wait((), (ssl,), (), timeout)
                 else:
                     raise SSLError(*err.args)
             else:
@@ -197,7 +197,7 @@ class _SSLSocket(object):
 
     @idiokit.stream
     def getpeercert(self, binary_form=False):
-        yield timer.sleep(0.0)
+        yield idiokit.finished()
         idiokit.stop(self._ssl.getpeercert(binary_form))
 
     @idiokit.stream
@@ -207,7 +207,7 @@ class _SSLSocket(object):
         timeout = socket._resolve_timeout(self, timeout)
 
         if bufsize <= 0:
-            yield timer.sleep(0.0)
+            yield idiokit.finished()
             idiokit.stop("")
 
         result = yield _wrapped(self._ssl, timeout, self._ssl.read, bufsize)
@@ -248,15 +248,16 @@ class _SSLSocket(object):
 
     @idiokit.stream
     def shutdown(self, how):
-        yield timer.sleep(0.0)
+        yield idiokit.finished()
 
         with socket.wrapped_socket_errors():
             self._ssl.shutdown(how)
 
     @idiokit.stream
     def close(self):
-        yield timer.sleep(0.0)
+        yield idiokit.finished()
 
+        select.closing(self._ssl)
         with socket.wrapped_socket_errors():
             self._ssl.close()
 
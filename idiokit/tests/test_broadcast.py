@@ -0,0 +1,104 @@
+import unittest
+
+from .. import idiokit, timer, broadcast
+
+
+@idiokit.stream
+def _produce(items, delay=None):
+    yield timer.sleep(0.0)
+    if delay is None:
+        yield idiokit.send_many(items)
+        return
+
+    for item in items:
+        yield idiokit.send(item)
+        yield timer.sleep(delay)
+
+
+@idiokit.stream
+def _collect(delay=None):
+    items = []
+    try:
+        while True:
+            items.append((yield idiokit.next()))
+            if delay is not None:
+                yield timer.sleep(delay)
+    except StopIteration:
+        pass
+    idiokit.stop(items)
+
+
+class BroadcastTests(unittest.TestCase):
+    def _run(self, hub, producer, *consumers):
+        @idiokit.stream
+        def main():
+            subscribers = [hub.subscribe() | consumer for consumer in consumers]
+            yield producer | hub
+
+            results = []
+            for subscriber in subscribers:
+                try:
+                    results.append((yield subscriber))
+                except broadcast.Overflow:
+                    results.append(None)
+            idiokit.stop(results)
+
+        return idiokit.main_loop(main())
+
+    def test_every_subscriber_gets_every_message(self):
+        hub = broadcast.Broadcast(size=4)
+        results = self._run(hub, _produce(range(20)), *[_collect() for _ in range(10)])
+        self.assertEqual(results, [range(20)] * 10)
+
+    def test_block(self):
+        hub = broadcast.Broadcast(size=2, policy=broadcast.BLOCK)
+        results = self._run(hub, _produce(range(10)), _collect(), _collect(0.001))
+        self.assertEqual(results, [range(10)] * 2)
+        self.assertEqual(hub.dropped, 0)
+
+    def test_drop(self):
+        hub = broadcast.Broadcast(size=4, policy=broadcast.DROP)
+        fast, slow = self._run(hub, _produce(range(100), 0.0), _collect(), _collect(0.002))
+        self.assertEqual(fast, range(100))
+        self.assertTrue(len(slow) < 100)
+        self.assertEqual(slow, sorted(slow))
+        self.assertEqual(hub.dropped, 100 - len(slow))
+
+    def test_disconnect(self):
+        hub = broadcast.Broadcast(size=4, policy=broadcast.DISCONNECT)
+        fast, slow = self._run(hub, _produce(range(100), 0.0), _collect(), _collect(0.002))
+        self.assertEqual(fast, range(100))
+        self.assertEqual(slow, None)
+
+    def test_upstream_error(self):
+        class Failure(Exception):
+            pass
+
+        @idiokit.stream
+        def fail():
+            yield timer.sleep(0.0)
+            yield idiokit.send_many([1, 2])
+            raise Failure()
+
+        @idiokit.stream
+        def main():
+            hub = broadcast.Broadcast(size=4)
+            subscribers = [hub.subscribe() | _collect() for _ in range(3)]
+            try:
+                yield fail() | hub
+            except Failure:
+                pass
+
+            for subscriber in subscribers:
+                try:
+                    yield subscriber
+                except Failure:
+                    pass
+                else:
+                    self.fail("subscriber did not see the upstream error")
+
+        idiokit.main_loop(main())
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, broadcast.Broadcast, size=0)
+        self.assertRaises(ValueError, broadcast.Broadcast, policy="other")
@@ -1,6 +1,6 @@
 import unittest
 
-from ..heap import Heap, HeapError
+from ..heap import Heap, LazyHeap, HeapError
 
 
 class HeapTests(unittest.TestCase):
@@ -24,3 +24,37 @@ class HeapTests(unittest.TestCase):
         while heap:
             values.append(heap.pop())
         self.assertEqual(values, sorted(values))
+
+    def test_heapify(self):
+        heap = Heap([5, 3, 8, 1, 9, 2])
+        self.assertEqual([heap.pop() for _ in range(6)], [1, 2, 3, 5, 8, 9])
+
+
+class LazyHeapTests(unittest.TestCase):
+    def test_pop_order(self):
+        heap = LazyHeap([3, 0, 2])
+        heap.push_many([5, 1, 4])
+        self.assertEqual([heap.pop() for _ in range(6)], range(6))
+        self.assertRaises(HeapError, heap.pop)
+
+    def test_lazy_pop(self):
+        heap = LazyHeap()
+        nodes = heap.push_many(range(200))
+        for node in nodes[:150]:
+            heap.pop(node)
+        self.assertRaises(HeapError, heap.pop, nodes[0])
+
+        self.assertEqual(len(heap), 50)
+        self.assertEqual(heap.peek(), 150)
+        self.assertTrue(heap.head() is nodes[150])
+
+    def test_pop_until(self):
+        heap = LazyHeap()
+        nodes = heap.push_many([(x, "value") for x in [4, 1, 3, 0, 2]])
+        heap.pop(nodes[2])
+
+        pairs = heap.pop_nodes_until(3, key=lambda value: value[0])
+        self.assertEqual([value[0] for _, value in pairs], [0, 1, 2])
+        self.assertTrue(pairs[0][0] is nodes[3])
+        self.assertEqual(heap.pop_until((5,)), [(4, "value")])
+        self.assertEqual(len(heap), 0)
@@ -0,0 +1,532 @@
+import os
+import signal
+import unittest
+import contextlib
+
+from .. import idiokit, timer, _selectloop
+
+
+@contextlib.contextmanager
+def _no_budget():
+    # Some tests check what gets batched together during one iteration,
+    # which a callback budget (e.g. from IDIOKIT_CALLBACK_BUDGET) spreads
+    # over several iterations.
+    loop = _selectloop.global_select_loop
+    previous = loop._budget
+    loop.set_budget(None)
+    try:
+        yield
+    finally:
+        loop.set_budget(previous)
+
+
+@idiokit.stream
+def _collect(max_items=None):
+    batches = []
+    try:
+        while True:
+            if max_items is None:
+                batches.append([(yield idiokit.next())])
+            else:
+                batches.append((yield idiokit.next_batch(max_items)))
+    except StopIteration:
+        pass
+    idiokit.stop(batches)
+
+
+@idiokit.stream
+def _take(count):
+    items = []
+    while len(items) < count:
+        items.extend((yield idiokit.next_batch(count - len(items))))
+    idiokit.stop(items)
+
+
+@idiokit.stream
+def _relay():
+    while True:
+        item = yield idiokit.next()
+        yield idiokit.send(item)
+
+
+class BatchTests(unittest.TestCase):
+    def test_send_many_to_next(self):
+        @idiokit.stream
+        def produce():
+            yield idiokit.send_many(range(5))
+            yield idiokit.send_many([])
+            yield idiokit.send(5)
+
+        batches = idiokit.main_loop(produce() | _collect())
+        self.assertEqual(sum(batches, []), range(6))
+
+    def test_send_many_to_next_batch(self):
+        @idiokit.stream
+        def produce():
+            yield idiokit.send_many(range(10))
+
+        with _no_budget():
+            batches = idiokit.main_loop(produce() | _collect(4))
+        self.assertEqual(sum(batches, []), range(10))
+        self.assertEqual(batches[0], range(4))
+        self.assertTrue(all(0 < len(batch) <= 4 for batch in batches))
+
+    def test_send_many_through_relay(self):
+        @idiokit.stream
+        def produce():
+            yield idiokit.send_many(range(10))
+
+        batches = idiokit.main_loop(produce() | _relay() | _collect(100))
+        self.assertEqual(sum(batches, []), range(10))
+
+    def test_next_batch_from_send(self):
+        @idiokit.stream
+        def produce():
+            for item in range(3):
+                yield idiokit.send(item)
+
+        batches = idiokit.main_loop(produce() | _collect(10))
+        self.assertEqual(sum(batches, []), range(3))
+
+    def test_send_many_backpressure(self):
+        received = []
+
+        @idiokit.stream
+        def produce():
+            yield idiokit.send_many(range(3))
+            received.append("done")
+
+        @idiokit.stream
+        def consume():
+            for _ in range(3):
+                received.append((yield idiokit.next()))
+                yield timer.sleep(0.01)
+            yield timer.sleep(0.01)
+
+        idiokit.main_loop(produce() | consume())
+        self.assertEqual(received, [0, 1, 2, "done"])
+
+    def test_next_batch_signal(self):
+        @idiokit.stream
+        def main():
+            batches = _collect(10)
+            yield batches.throw(ValueError())
+            yield batches
+
+        self.assertRaises(ValueError, idiokit.main_loop, main())
+
+    def test_interrupted_send_many(self):
+        @idiokit.stream
+        def produce():
+            try:
+                yield idiokit.send_many(range(10))
+            except ValueError:
+                pass
+            yield idiokit.send("after")
+
+        @idiokit.stream
+        def main():
+            producer = produce()
+            first = yield producer.fork() | idiokit.next()
+            yield producer.throw(ValueError())
+            rest = yield producer | _collect()
+            idiokit.stop(first, rest)
+
+        first, rest = idiokit.main_loop(main())
+        self.assertEqual(first, 0)
+        self.assertEqual(sum(rest, []), ["after"])
+
+    def test_invalid_max_items(self):
+        self.assertRaises(ValueError, idiokit.next_batch, 0)
+
+
+class FinishedTests(unittest.TestCase):
+    def test_finished_result(self):
+        @idiokit.stream
+        def main():
+            first = yield idiokit.finished()
+            second = yield idiokit.finished(1, 2)
+            idiokit.stop(first, second)
+
+        self.assertEqual(idiokit.main_loop(main()), (None, (1, 2)))
+
+    def test_bounded_recursion(self):
+        ticks = []
+
+        @idiokit.stream
+        def busy():
+            for _ in xrange(10000):
+                yield idiokit.finished()
+            ticks.append(None)
+            idiokit.stop(len(ticks))
+
+        @idiokit.stream
+        def ticker():
+            while len(ticks) < 1000:
+                ticks.append(None)
+                yield timer.sleep(0.0)
+
+        @idiokit.stream
+        def main():
+            ticker()
+            count = yield busy()
+            idiokit.stop(count)
+
+        self.assertTrue(idiokit.main_loop(main()) > 0)
+
+    def test_finished_stream(self):
+        @idiokit.stream
+        def inner():
+            yield timer.sleep(0.0)
+            idiokit.stop(1)
+
+        @idiokit.stream
+        def main():
+            stream = inner()
+            first = yield stream
+            second = yield stream
+            idiokit.stop(first, second)
+
+        self.assertEqual(idiokit.main_loop(main()), (1, 1))
+
+
+class PipeTests(unittest.TestCase):
+    def test_messages_and_result(self):
+        @idiokit.stream
+        def produce():
+            yield idiokit.send_many(range(5))
+
+        stages = [produce()] + [_relay() for _ in range(10)] + [_collect()]
+        batches = idiokit.main_loop(idiokit.pipe(*stages))
+        self.assertEqual(sum(batches, []), range(5))
+
+    def test_error_propagates_downstream(self):
+        @idiokit.stream
+        def fail():
+            yield idiokit.finished()
+            raise ValueError()
+
+        pipe = idiokit.pipe(fail(), _relay(), _relay(), _collect())
+        self.assertRaises(ValueError, idiokit.main_loop, pipe)
+
+    def test_broken_pipe_propagates_upstream(self):
+        results = []
+
+        @idiokit.stream
+        def produce():
+            try:
+                while True:
+                    yield idiokit.send(None)
+            except idiokit.BrokenPipe:
+                results.append("broken")
+
+        @idiokit.stream
+        def take_one():
+            yield idiokit.next()
+            idiokit.stop("done")
+
+        pipe = idiokit.pipe(produce(), _relay(), _relay(), take_one())
+        self.assertEqual(idiokit.main_loop(pipe), "done")
+        self.assertEqual(results, ["broken"])
+
+    def test_or_matches_pipe(self):
+        def run(build):
+            events = []
+
+            @idiokit.stream
+            def slow():
+                try:
+                    yield timer.sleep(0.01)
+                except idiokit.BrokenPipe:
+                    events.append("broken")
+                yield timer.sleep(0.01)
+                events.append("slow")
+
+            @idiokit.stream
+            def quick():
+                yield idiokit.finished()
+                events.append("quick")
+
+            @idiokit.stream
+            def last():
+                try:
+                    yield idiokit.next()
+                except StopIteration:
+                    events.append("stopped")
+                idiokit.stop("done")
+
+            result = idiokit.main_loop(build(slow(), quick(), last()))
+            return result, events
+
+        # The last stage gets StopIteration as soon as the stage next to
+        # it finishes, without waiting for the first stage.
+        expected = "done", ["quick", "broken", "stopped", "slow"]
+        self.assertEqual(run(lambda a, b, c: a | b | c), expected)
+        self.assertEqual(run(lambda a, b, c: a | (b | c)), expected)
+        self.assertEqual(run(idiokit.pipe), expected)
+        self.assertEqual(run(lambda a, b, c: idiokit.pipe(a | b, c)), expected)
+
+
+class BufferTests(unittest.TestCase):
+    def _produce(self, items, depths, buf):
+        @idiokit.stream
+        def produce():
+            for item in items:
+                yield idiokit.send(item)
+                depths.append(buf.depth)
+        return produce()
+
+    def test_order_and_result(self):
+        buf = idiokit.buffer(4)
+        result = idiokit.main_loop(self._produce(range(20), [], buf) | buf | _collect())
+        self.assertEqual(sum(result, []), range(20))
+
+    def test_producer_runs_ahead_up_to_the_limit(self):
+        depths = []
+        consumed = []
+        buf = idiokit.buffer(8, low_water=0.25)
+
+        @idiokit.stream
+        def slow():
+            while True:
+                item = yield idiokit.next()
+                consumed.append(item)
+                yield timer.sleep(0.001)
+
+        idiokit.main_loop(self._produce(range(50), depths, buf) | buf | slow())
+        self.assertEqual(consumed, range(50))
+        self.assertTrue(4 < max(depths) <= 8)
+        self.assertEqual(buf.depth, 0)
+
+    def test_producer_resumes_at_low_water(self):
+        events = []
+        buf = idiokit.buffer(4, low_water=0.5)
+
+        @idiokit.stream
+        def produce():
+            for item in range(12):
+                yield idiokit.send(item)
+                events.append(("sent", item))
+
+        @idiokit.stream
+        def consume():
+            while True:
+                item = yield idiokit.next()
+                events.append(("received", buf.depth))
+                yield timer.sleep(0.001)
+
+        idiokit.main_loop(produce() | buf | consume())
+
+        sent = 0
+        received = 0
+        for kind, value in events:
+            if kind == "sent":
+                sent += 1
+                continue
+
+            # The depth is exact in the middle of a drain, and the
+            # producer gets to refill the queue before it runs dry.
+            received += 1
+            self.assertEqual(value, sent - received)
+            if sent < 12:
+                self.assertTrue(value > 0)
+        self.assertEqual((sent, received), (12, 12))
+
+    def test_max_bytes(self):
+        depths = []
+        buf = idiokit.buffer(1000, max_bytes=10)
+
+        @idiokit.stream
+        def main():
+            yield self._produce(["abcd"] * 10, depths, buf) | buf | _collect()
+            idiokit.stop(buf.depth_bytes)
+
+        self.assertEqual(idiokit.main_loop(main()), 0)
+        self.assertTrue(max(depths) <= 3)
+
+    def test_error_after_queued_messages(self):
+        received = []
+
+        @idiokit.stream
+        def produce():
+            yield idiokit.send_many([1, 2, 3])
+            raise ValueError()
+
+        @idiokit.stream
+        def consume():
+            while True:
+                received.append((yield idiokit.next()))
+
+        @idiokit.stream
+        def main():
+            try:
+                yield produce() | idiokit.buffer(10) | consume()
+            except ValueError:
+                idiokit.stop(received)
+
+        self.assertEqual(idiokit.main_loop(main()), [1, 2, 3])
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, idiokit.buffer, 0)
+        self.assertRaises(ValueError, idiokit.buffer, 1, 0)
+        self.assertRaises(ValueError, idiokit.buffer, 1, None, 1.0)
+
+
+class ParallelMapTests(unittest.TestCase):
+    def _run(self, func, items, **keys):
+        @idiokit.stream
+        def produce():
+            yield idiokit.send_many(items)
+
+        @idiokit.stream
+        def main():
+            batches = yield produce() | idiokit.parallel_map(func, **keys) | _collect()
+            idiokit.stop(sum(batches, []))
+
+        return idiokit.main_loop(main())
+
+    def test_ordered(self):
+        @idiokit.stream
+        def work(item):
+            yield timer.sleep(0.001 * (10 - item))
+            idiokit.stop(item * 2)
+
+        self.assertEqual(self._run(work, range(10), concurrency=4), range(0, 20, 2))
+
+    def test_unordered(self):
+        @idiokit.stream
+        def work(item):
+            yield timer.sleep(0.005 * item)
+            idiokit.stop(item)
+
+        self.assertEqual(self._run(work, [3, 1, 2, 0], concurrency=4, ordered=False), [0, 1, 2, 3])
+
+    def test_concurrency_limit(self):
+        running = []
+        peak = []
+
+        @idiokit.stream
+        def work(item):
+            running.append(item)
+            peak.append(len(running))
+            yield timer.sleep(0.001)
+            running.remove(item)
+            idiokit.stop(item)
+
+        self.assertEqual(self._run(work, range(20), concurrency=3), range(20))
+        self.assertEqual(max(peak), 3)
+
+    def test_error(self):
+        cancelled = []
+
+        @idiokit.stream
+        def work(item):
+            if item == 2:
+                yield timer.sleep(0.0)
+                raise ValueError(item)
+
+            try:
+                yield timer.sleep(1.0 if item > 2 else 0.0)
+            except idiokit.BrokenPipe:
+                cancelled.append(item)
+                raise
+            idiokit.stop(item)
+
+        received = []
+
+        @idiokit.stream
+        def consume():
+            while True:
+                received.append((yield idiokit.next()))
+
+        @idiokit.stream
+        def main():
+            try:
+                yield idiokit.send_many(range(6)) | idiokit.parallel_map(work, concurrency=4) | consume()
+            except ValueError as error:
+                idiokit.stop(error.args)
+
+        self.assertEqual(idiokit.main_loop(main()), (2,))
+        self.assertEqual(received, [0, 1])
+
+        # Whether the items after 3 got started before the error depends
+        # on the scheduling, but those that did must have been cancelled.
+        self.assertIn(3, cancelled)
+        self.assertTrue(all(item > 2 for item in cancelled))
+
+
+class WindowTests(unittest.TestCase):
+    def _run(self, source, **keys):
+        @idiokit.stream
+        def main():
+            batches = yield source | idiokit.window(**keys) | _collect()
+            idiokit.stop([batch[0] for batch in batches])
+
+        return idiokit.main_loop(main())
+
+    def test_max_items(self):
+        windows = self._run(idiokit.send_many(range(7)), max_items=3)
+        self.assertEqual(windows, [[0, 1, 2], [3, 4, 5], [6]])
+
+    def test_max_bytes(self):
+        windows = self._run(idiokit.send_many(["ab", "cd", "e", "fgh", "i"]), max_bytes=3)
+        self.assertEqual(windows, [["ab", "cd"], ["e", "fgh"], ["i"]])
+
+    def test_max_delay(self):
+        @idiokit.stream
+        def source():
+            yield idiokit.send_many([1, 2])
+            yield timer.sleep(0.05)
+            yield idiokit.send_many([3, 4])
+
+        self.assertEqual(self._run(source(), max_delay=0.01), [[1, 2], [3, 4]])
+
+    def test_result_and_error(self):
+        @idiokit.stream
+        def source(fail):
+            yield idiokit.send(1)
+            if fail:
+                raise ValueError()
+            idiokit.stop("done")
+
+        @idiokit.stream
+        def drain():
+            while True:
+                yield idiokit.next()
+
+        @idiokit.stream
+        def main():
+            result = yield source(False) | idiokit.window(max_items=10) | drain()
+            idiokit.stop(result)
+
+        self.assertEqual(idiokit.main_loop(main()), "done")
+        self.assertRaises(ValueError, self._run, source(True), max_delay=0.0)
+
+
+class SignalTests(unittest.TestCase):
+    def test_main_loop_signal(self):
+        @idiokit.stream
+        def main():
+            os.kill(os.getpid(), signal.SIGUSR2)
+            yield timer.sleep(1.0)
+
+        try:
+            idiokit.main_loop(main())
+        except idiokit.Signal as sig:
+            self.assertEqual(sig.signum, signal.SIGUSR2)
+        else:
+            self.fail("Signal not raised")
+
+    def test_watch_signals(self):
+        @idiokit.stream
+        def main():
+            watcher = idiokit.watch_signals(signal.SIGUSR1)
+            yield timer.sleep(0.0)
+            os.kill(os.getpid(), signal.SIGUSR1)
+            os.kill(os.getpid(), signal.SIGUSR1)
+            signums = yield watcher | _take(2)
+            idiokit.stop(signums)
+
+        previous = signal.getsignal(signal.SIGUSR1)
+        self.assertEqual(idiokit.main_loop(main(), catch_signals=()), [signal.SIGUSR1] * 2)
+        self.assertEqual(signal.getsignal(signal.SIGUSR1), previous)
@@ -0,0 +1,68 @@
+import time
+import unittest
+
+from .. import idiokit, timer, _selectloop, monitor
+
+
+class StallWatchdogTests(unittest.TestCase):
+    def test_reports_stall_once(self):
+        stalls = []
+        loop = _selectloop.SelectLoop()
+        watchdog = monitor.StallWatchdog(0.05, stalls.append, loop).start()
+        try:
+            loop.sleep(0.0, time.sleep, 0.3)
+            loop.iterate()
+        finally:
+            watchdog.stop()
+
+        self.assertEqual(len(stalls), 1)
+        self.assertTrue(stalls[0].callback is time.sleep)
+        self.assertTrue(stalls[0].duration >= 0.05)
+        self.assertTrue(stalls[0].stack)
+
+    def test_no_stall(self):
+        stalls = []
+        loop = _selectloop.SelectLoop()
+        watchdog = monitor.StallWatchdog(0.5, stalls.append, loop).start()
+        try:
+            for _ in range(10):
+                loop.sleep(0.0, time.sleep, 0.01)
+                loop.iterate()
+        finally:
+            watchdog.stop()
+        self.assertEqual(stalls, [])
+
+
+class StreamRegistryTests(unittest.TestCase):
+    def setUp(self):
+        monitor.track_streams()
+
+    def tearDown(self):
+        monitor.untrack_streams()
+
+    def test_running_streams(self):
+        event = idiokit.Event()
+        reports = []
+
+        @idiokit.stream
+        def leaky():
+            yield event
+
+        @idiokit.stream
+        def main():
+            streams = [leaky(), leaky()]
+            yield timer.sleep(0.0)
+
+            infos = [x for x in monitor.running_streams() if x.stream in streams]
+            reports.append(monitor.format_streams(infos))
+
+            event.succeed()
+            yield idiokit.pipe(*streams)
+
+        idiokit.main_loop(main())
+
+        lines = reports[0].splitlines()
+        self.assertTrue(lines[0].startswith("2 x leaky ("))
+        self.assertIn(" in main (2)", lines[1])
+        self.assertTrue(lines[2].endswith(" on Event (2)"))
+        self.assertEqual(len(lines), 3)
@@ -0,0 +1,60 @@
+import os
+import socket
+import select
+import unittest
+
+from .. import idiokit, processpool
+
+
+def _square(number):
+    return number * number
+
+
+def _fail(message):
+    raise ValueError(message)
+
+
+class ProcessPoolTests(unittest.TestCase):
+    def setUp(self):
+        self.pool = processpool.ProcessPool(max_workers=2, idle_time=0.1)
+
+    def test_run(self):
+        self.assertEqual(idiokit.main_loop(self.pool.run(_square, 3)), 9)
+        self.assertNotEqual(idiokit.main_loop(self.pool.run(os.getpid)), os.getpid())
+
+    def test_run_error(self):
+        try:
+            idiokit.main_loop(self.pool.run(_fail, "oops"))
+        except ValueError as error:
+            self.assertEqual(error.args, ("oops",))
+        else:
+            self.fail("ValueError not raised")
+
+    def test_unpicklable_job(self):
+        self.assertRaises(Exception, idiokit.main_loop, self.pool.run(lambda: None))
+        self.assertEqual(idiokit.main_loop(self.pool.run(_square, 2)), 4)
+
+    def test_map(self):
+        @idiokit.stream
+        def main():
+            results = yield self.pool.map(_square, [(x,) for x in range(10)], chunk_size=3)
+            idiokit.stop(results)
+
+        self.assertEqual(idiokit.main_loop(main()), [x * x for x in range(10)])
+        self.assertTrue(self.pool.alive <= 2)
+
+    def test_worker_does_not_keep_parent_fds(self):
+        left, right = socket.socketpair()
+        try:
+            # Start the worker while both sockets are open.
+            self.assertEqual(idiokit.main_loop(self.pool.run(_square, 2)), 4)
+            self.assertEqual(self.pool.alive, 1)
+
+            # The other end sees EOF only when no process keeps a copy.
+            left.close()
+            readable, _, _ = select.select([right], [], [], 1.0)
+            self.assertEqual(readable, [right])
+            self.assertEqual(right.recv(1), "")
+        finally:
+            left.close()
+            right.close()
@@ -0,0 +1,39 @@
+import unittest
+
+from .. import idiokit, timer, profiler
+
+
+class ProfilerTests(unittest.TestCase):
+    def setUp(self):
+        self.profiler = profiler.Profiler()
+        idiokit.GeneratorBasedStream._tracing += 1
+
+    def tearDown(self):
+        idiokit.GeneratorBasedStream._tracing -= 1
+
+    def test_samples_are_attributed_to_stream_paths(self):
+        sample = self.profiler.sample
+
+        @idiokit.stream
+        def inner():
+            yield timer.sleep(0.0)
+            sample()
+
+        @idiokit.stream
+        def outer():
+            yield inner()
+
+        idiokit.main_loop(outer())
+
+        lines = self.profiler.collapsed()
+        self.assertEqual(len(lines), 1)
+
+        stack, count = lines[0].rsplit(" ", 1)
+        frames = stack.split(";")
+        self.assertEqual(count, "1")
+        self.assertTrue(frames[0].startswith("outer ("))
+        self.assertTrue(frames[1].startswith("inner ("))
+        self.assertTrue(frames[2].startswith("sample ("))
+
+        self.profiler.reset()
+        self.assertEqual(self.profiler.collapsed(), [])
@@ -0,0 +1,427 @@
+import os
+import time
+import select
+import signal
+import socket
+import unittest
+import threading
+
+from .. import _selectloop
+
+
+class _LoopTests(object):
+    def create_loop(self):
+        raise NotImplementedError()
+
+    def setUp(self):
+        self.loop = self.create_loop()
+        self.left, self.right = socket.socketpair()
+        self.results = []
+
+    def tearDown(self):
+        self.left.close()
+        self.right.close()
+
+    def _callback(self, *args):
+        self.results.append(args)
+
+    def test_sleep(self):
+        self.loop.sleep(0.0, self._callback, 1)
+        self.loop.iterate()
+        self.assertEqual(self.results, [(1,)])
+
+    def test_cancel(self):
+        node = self.loop.sleep(0.01, self._callback, 1)
+        self.assertTrue(self.loop.cancel(node))
+        self.assertFalse(self.loop.cancel(node))
+
+    def test_select_fast_path(self):
+        self.right.send("x")
+        self.loop.select((self.left,), (), (), None, self._callback)
+        self.loop.iterate()
+        self.assertEqual(self.results, [(False, [self.left], [], [])])
+
+    def test_select_readable(self):
+        self.loop.select((self.left,), (), (), None, self._callback)
+        self.right.send("x")
+        self.loop.iterate()
+        self.assertEqual(len(self.results), 1)
+
+        has_errors, rfds, wfds, xfds = self.results[0]
+        self.assertFalse(has_errors)
+        self.assertEqual(list(rfds), [self.left])
+
+    def test_select_timeout(self):
+        self.loop.select((self.left,), (), (), 0.0, self._callback)
+        self.loop.iterate()
+        self.assertEqual(self.results, [(False, (), (), ())])
+
+    def test_select_cancel(self):
+        node = self.loop.select((self.left,), (), (), None, self._callback)
+        self.loop.cancel(node)
+        self.right.send("x")
+        self.loop.sleep(0.0, self._callback, "done")
+        self.loop.iterate()
+        self.assertEqual(self.results, [("done",)])
+
+    def test_select_bad_fd(self):
+        fd = os.dup(self.left.fileno())
+        os.close(fd)
+        self.loop.select((fd,), (), (), None, self._callback)
+        self.loop.iterate()
+        self.assertEqual(len(self.results), 1)
+        self.assertTrue(self.results[0][0])
+
+    def test_select_closed_after_registration(self):
+        self.loop.wait((self.left,), (), (), None, self._callback, "left")
+        self.loop.sleep(0.0, self._callback, "tick")
+        self.loop.iterate()
+
+        # Waiters on an object closed after its registration must get woken
+        # up with an error instead of waiting forever.
+        self.loop.closing(self.left)
+        self.left.close()
+        self.loop.sleep(1.0, self._callback, "timeout")
+        self.loop.iterate()
+        self.assertEqual(len(self.results), 2)
+
+        has_errors, rfds, wfds, xfds, name = self.results[1]
+        self.assertTrue(has_errors)
+        self.assertEqual(list(rfds), [self.left])
+        self.assertEqual(name, "left")
+
+    def test_select_fd_closed_after_registration(self):
+        fd = os.dup(self.left.fileno())
+        self.loop.wait((fd,), (), (), None, self._callback, "fd")
+        self.loop.sleep(0.0, self._callback, "tick")
+        self.loop.iterate()
+
+        self.loop.closing(fd)
+        os.close(fd)
+        self.loop.sleep(1.0, self._callback, "timeout")
+        self.loop.iterate()
+        self.assertEqual(len(self.results), 2)
+        self.assertTrue(self.results[1][0])
+        self.assertEqual(self.results[1][-1], "fd")
+
+    def test_deliver_from_thread(self):
+        writes = []
+        write = self.loop._write
+        self.loop._write = lambda fd, data: writes.append(data) or write(fd, data)
+
+        thread = threading.Thread(target=lambda: [self.loop.deliver(self._callback, x) for x in range(100)])
+        thread.start()
+        thread.join()
+
+        # The loop must not block while delivered calls are waiting.
+        self.loop.sleep(None, self._callback, "never")
+        self.loop.iterate()
+        self.assertEqual(self.results, [(x,) for x in range(100)])
+        self.assertEqual(len(writes), 1)
+
+        self.loop.deliver(self._callback, "again")
+        self.loop.iterate()
+        self.assertEqual(self.results[-1], ("again",))
+
+
+class SelectLoopTests(_LoopTests, unittest.TestCase):
+    def create_loop(self):
+        return _selectloop.SelectLoop()
+
+
+class PipeWakeupSelectLoopTests(_LoopTests, unittest.TestCase):
+    def create_loop(self):
+        return _selectloop.SelectLoop(wakeup="pipe")
+
+
+@unittest.skipIf(_selectloop._eventfd is None, "eventfd not supported")
+class EventFDWakeupSelectLoopTests(_LoopTests, unittest.TestCase):
+    def create_loop(self):
+        return _selectloop.SelectLoop(wakeup="eventfd")
+
+    def test_wakeup_from_thread(self):
+        def wake():
+            time.sleep(0.05)
+            self.loop.asap(self._callback, 1)
+
+        thread = threading.Thread(target=wake)
+        thread.start()
+        self.loop.sleep(None, self._callback, "never")
+        self.loop.iterate()
+        thread.join()
+        self.assertEqual(self.results, [(1,)])
+
+
+@unittest.skipUnless(hasattr(select, "epoll"), "epoll not supported")
+class EpollSelectLoopTests(_LoopTests, unittest.TestCase):
+    def create_loop(self):
+        return _selectloop.EpollSelectLoop()
+
+    def test_shared_fileno(self):
+        wrapper = socket.socket(_sock=self.left)
+        self.loop.select((self.left,), (), (), None, self._callback, 1)
+        self.loop.select((wrapper,), (), (), None, self._callback, 2)
+        self.right.send("x")
+        self.loop.iterate()
+        self.assertEqual(sorted(x[-1] for x in self.results), [1, 2])
+
+    def test_recycled_fileno(self):
+        self.loop.select((self.left,), (), (), None, self._callback, 1)
+        self.right.send("x")
+        self.loop.iterate()
+
+        # Close the sockets while their descriptors are still registered and
+        # check that new sockets reusing the descriptor numbers get noticed.
+        fileno = self.left.fileno()
+        self.left.close()
+        self.right.close()
+        self.left, self.right = socket.socketpair()
+        self.assertEqual(self.left.fileno(), fileno)
+
+        self.loop.select((self.left,), (), (), None, self._callback, 2)
+        self.loop.sleep(0.0, self._callback, "tick")
+        self.loop.iterate()
+        self.right.send("x")
+        self.loop.iterate()
+        self.assertEqual([x[-1] for x in self.results], [1, "tick", 2])
+
+
+    def test_idle_registrations_cost_nothing(self):
+        class Counted(object):
+            def __init__(self, sock):
+                self.sock = sock
+                self.calls = 0
+
+            def fileno(self):
+                self.calls += 1
+                return self.sock.fileno()
+
+        pairs = [socket.socketpair() for _ in range(50)]
+        try:
+            objs = [Counted(left) for left, _ in pairs]
+            for obj in objs:
+                self.loop.wait((obj,), (), (), None, self._callback)
+            self.loop.sleep(0.0, self._callback, "tick")
+            self.loop.iterate()
+            calls = sum(obj.calls for obj in objs)
+
+            # Blocking iterations must not touch the idle registrations.
+            for _ in range(10):
+                self.loop.sleep(0.001, self._callback, "tick")
+                self.loop.iterate()
+            self.assertEqual(sum(obj.calls for obj in objs), calls)
+            self.assertEqual(self.loop._collect_stats(0, 0.0, 0.0).fds, 50)
+        finally:
+            for left, right in pairs:
+                left.close()
+                right.close()
+
+
+class TimerTests(unittest.TestCase):
+    def test_timers_in_order(self):
+        results = []
+        loop = _selectloop.SelectLoop(resolution=0.001)
+        for timeout in [0.003, 0.001, 0.002]:
+            loop.sleep(timeout, results.append, timeout)
+        loop.sleep(None, results.append, None)
+        while len(results) < 3:
+            loop.iterate()
+        self.assertEqual(results, [0.001, 0.002, 0.003])
+
+    def test_cancel_wheel_node(self):
+        loop = _selectloop.SelectLoop(resolution=0.001)
+        node = loop.sleep(1.0, lambda: None)
+        self.assertTrue(loop.cancel(node))
+        self.assertFalse(loop.cancel(node))
+
+    def test_slack(self):
+        results = []
+        clock = [100.003]
+        loop = _selectloop.SelectLoop(resolution=0)
+        loop._monotonic = lambda: clock[0]
+
+        loop.sleep_with_slack(0.011, 0.05, results.append, 1)
+        loop.sleep_with_slack(0.019, 0.05, results.append, 2)
+        loop.sleep(0.011, results.append, 3)
+
+        # The slack timers share the deadline 100.05, the exact one is due
+        # at 100.014.
+        clock[0] = 100.03
+        loop.iterate()
+        self.assertEqual(results, [3])
+
+        clock[0] = 100.06
+        loop.iterate()
+        self.assertEqual(results, [3, 1, 2])
+
+    def test_cached_now(self):
+        results = []
+        loop = _selectloop.SelectLoop()
+
+        def callback():
+            now = loop.now()
+            time.sleep(0.01)
+            results.append((now, loop.now(), loop.update_now()))
+
+        loop.sleep(0.0, callback)
+        loop.iterate()
+
+        before, cached, updated = results[0]
+        self.assertEqual(before, cached)
+        self.assertTrue(updated >= cached + 0.01)
+        self.assertEqual(loop.now(), updated)
+
+    def test_timeout_after_blocking_gap(self):
+        results = []
+        clock = [100.0]
+        loop = _selectloop.SelectLoop(resolution=0)
+        loop._monotonic = lambda: clock[0]
+        loop.sleep(0.0, results.append, "first")
+        loop.iterate()
+
+        # Timeouts set outside the loop's callbacks must not be relative to
+        # the time cached by an earlier iteration.
+        clock[0] = 101.0
+        loop.sleep(1.0, results.append, "timer")
+        loop.sleep(0.0, results.append, "tick")
+
+        clock[0] = 101.5
+        loop.iterate()
+        self.assertEqual(results, ["first", "tick"])
+
+        clock[0] = 102.0
+        loop.iterate()
+        self.assertEqual(results, ["first", "tick", "timer"])
+
+
+class SignalTests(unittest.TestCase):
+    def test_signal_handler(self):
+        results = []
+        loop = _selectloop.SelectLoop()
+        previous = signal.getsignal(signal.SIGUSR1)
+
+        loop.add_signal_handler(signal.SIGUSR1, results.append)
+        try:
+            os.kill(os.getpid(), signal.SIGUSR1)
+            loop.sleep(1.0, results.append, "timeout")
+            loop.iterate()
+        finally:
+            loop.remove_signal_handler(signal.SIGUSR1, results.append)
+
+        self.assertEqual(results, [signal.SIGUSR1])
+        self.assertEqual(signal.getsignal(signal.SIGUSR1), previous)
+
+    def test_undispatched_signals_dropped_on_close(self):
+        results = []
+        loop = _selectloop.SelectLoop()
+
+        loop.add_signal_handler(signal.SIGUSR1, results.append)
+        os.kill(os.getpid(), signal.SIGUSR1)
+        loop.remove_signal_handler(signal.SIGUSR1, results.append)
+
+        loop.add_signal_handler(signal.SIGUSR1, results.append)
+        try:
+            os.kill(os.getpid(), signal.SIGUSR1)
+            loop.sleep(1.0, results.append, "timeout")
+            loop.iterate()
+        finally:
+            loop.remove_signal_handler(signal.SIGUSR1, results.append)
+
+        self.assertEqual(results, [signal.SIGUSR1])
+
+    def _open_fds(self):
+        return set(os.listdir("/proc/self/fd"))
+
+    @unittest.skipUnless(os.path.isdir("/proc/self/fd"), "/proc/self/fd not available")
+    def test_failed_setup_closes_pipe(self):
+        loop = _selectloop.SelectLoop()
+        fds = self._open_fds()
+        previous = signal.getsignal(signal.SIGUSR1)
+
+        # SIGKILL can't be caught, so installing the handler fails.
+        self.assertRaises(RuntimeError, loop.add_signal_handler, signal.SIGKILL, lambda signum: None)
+        self.assertEqual(self._open_fds(), fds)
+        self.assertEqual(signal.set_wakeup_fd(-1), -1)
+
+        # set_wakeup_fd only works in the main thread.
+        errors = []
+
+        def add():
+            try:
+                loop.add_signal_handler(signal.SIGUSR1, lambda signum: None)
+            except ValueError as error:
+                errors.append(error)
+
+        thread = threading.Thread(target=add)
+        thread.start()
+        thread.join()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(self._open_fds(), fds)
+        self.assertEqual(signal.getsignal(signal.SIGUSR1), previous)
+
+
+class StatsTests(unittest.TestCase):
+    def test_stats_hook(self):
+        stats = []
+        loop = _selectloop.SelectLoop()
+        loop.add_stats_hook(stats.append)
+        loop.sleep(0.0, loop.asap, lambda: None)
+        loop.sleep(1.0, lambda: None)
+        loop.iterate()
+
+        self.assertEqual(len(stats), 1)
+        self.assertEqual(stats[0].callbacks, 2)
+        self.assertEqual(stats[0].timers, 1)
+
+        loop.remove_stats_hook(stats.append)
+        loop.sleep(0.0, lambda: None)
+        loop.iterate()
+        self.assertEqual(len(stats), 1)
+
+
+class BudgetTests(unittest.TestCase):
+    def test_budget(self):
+        results = []
+        stats = []
+        loop = _selectloop.SelectLoop(budget=3)
+        loop.add_stats_hook(stats.append)
+
+        def chatty(count):
+            results.append(count)
+            if count < 10:
+                loop.asap(chatty, count + 1)
+
+        loop.asap(chatty, 0)
+        loop.iterate()
+        self.assertEqual(results, [0, 1, 2])
+        self.assertEqual(stats[-1].deferred, 1)
+
+        # The deferred calls run before the timers due in the next
+        # iteration, and the calls they schedule run after the timers.
+        loop.sleep(0.0, results.append, "timer")
+        loop.iterate()
+        self.assertEqual(results, [0, 1, 2, 3, "timer", 4])
+
+        while len(results) < 12:
+            loop.iterate()
+        self.assertEqual(results[-1], 10)
+        self.assertEqual(stats[-1].deferred, 0)
+
+    def test_no_starvation_under_load(self):
+        results = []
+        loop = _selectloop.SelectLoop(budget=3)
+
+        # Schedule more new calls per iteration than the budget allows, so
+        # that the backlog keeps growing. The oldest calls must still get
+        # run first.
+        for iteration in range(10):
+            for index in range(4):
+                loop.asap(results.append, (iteration, index))
+            loop.iterate()
+
+        self.assertEqual(len(results), 30)
+        self.assertEqual(results, sorted(results))
+        self.assertEqual(results[3], (0, 3))
+
+    def test_invalid_budget(self):
+        self.assertRaises(ValueError, _selectloop.SelectLoop, budget=0)
@@ -0,0 +1,53 @@
+import time
+import unittest
+
+from .. import idiokit, socket, timer
+
+
+class CountdownTests(unittest.TestCase):
+    def test_last_attempt_after_timeout(self):
+        steps = socket.countdown(0.01)
+        self.assertEqual(next(steps), 0.01)
+
+        time.sleep(0.02)
+        self.assertEqual(next(steps), 0.0)
+        self.assertRaises(socket.SocketTimeout, next, steps)
+
+    def test_no_timeout(self):
+        steps = socket.countdown(None)
+        self.assertEqual([next(steps) for _ in range(3)], [None] * 3)
+
+
+class SocketTests(unittest.TestCase):
+    def test_recv_timeout(self):
+        left, right = socket.socketpair()
+        try:
+            self.assertRaises(socket.SocketTimeout, idiokit.main_loop, left.recv(10, timeout=0.01))
+        finally:
+            left._socket.close()
+            right._socket.close()
+
+    def test_close_wakes_up_recv(self):
+        left, right = socket.socketpair()
+
+        @idiokit.stream
+        def close_later():
+            yield timer.sleep(0.01)
+            yield left.close()
+
+        @idiokit.stream
+        def main():
+            closer = close_later()
+            try:
+                yield timer.timeout(1.0, left.recv(10))
+            except socket.SocketError as error:
+                idiokit.stop(error)
+            finally:
+                yield closer
+
+        try:
+            error = idiokit.main_loop(main())
+            self.assertFalse(isinstance(error, timer.Timeout))
+            self.assertTrue(isinstance(error, socket.SocketError))
+        finally:
+            right._socket.close()
@@ -0,0 +1,51 @@
+import threading
+import unittest
+
+from .. import idiokit, timer, threadpool
+
+
+class ThreadPoolTests(unittest.TestCase):
+    def test_max_threads_and_priorities(self):
+        pool = threadpool.ThreadPool(max_threads=1)
+        gate = threading.Event()
+        order = []
+
+        @idiokit.stream
+        def main():
+            first = pool.run(gate.wait)
+            calls = [
+                pool.run_with_priority(1, order.append, "low"),
+                pool.run_with_priority(0, order.append, "high-1"),
+                pool.run_with_priority(0, order.append, "high-2")
+            ]
+            yield timer.sleep(0.01)
+            self.assertEqual(pool.stats().queued, 3)
+            self.assertEqual(pool.stats().busy, 1)
+
+            gate.set()
+            yield first
+            for call in calls:
+                yield call
+
+        idiokit.main_loop(main())
+        self.assertEqual(order, ["high-1", "high-2", "low"])
+
+        stats = pool.stats()
+        self.assertEqual(stats.threads, 1)
+        self.assertEqual((stats.busy, stats.queued, stats.completed), (0, 0, 4))
+        self.assertTrue(stats.wait_time > 0.0)
+
+    def test_error(self):
+        pool = threadpool.ThreadPool(max_threads=2)
+        self.assertRaises(ZeroDivisionError, idiokit.main_loop, pool.run(divmod, 1, 0))
+        self.assertEqual(idiokit.main_loop(pool.run(divmod, 7, 2)), (3, 1))
+
+    def test_named_pool(self):
+        pool = threadpool.named_pool("test-disk", max_threads=2)
+        self.assertTrue(threadpool.named_pool("test-disk") is pool)
+        self.assertTrue(pool is not threadpool.global_threadpool)
+        self.assertEqual(pool.max_threads, 2)
+
+    def test_global_pool_unbounded(self):
+        self.assertEqual(threadpool.global_threadpool.max_threads, None)
+        self.assertEqual(threadpool.named_pool("test-unbounded").max_threads, None)
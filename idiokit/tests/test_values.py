@@ -0,0 +1,52 @@
+import unittest
+
+from .. import _selectloop
+from ..values import Value
+
+
+class ValueTests(unittest.TestCase):
+    def _run(self):
+        loop = _selectloop.global_select_loop
+        while loop._immediate or loop._deferred:
+            _selectloop.iterate()
+
+    def test_listeners(self):
+        calls = []
+
+        def first(value, result):
+            calls.append(("first", result))
+
+        def second(value, result):
+            calls.append(("second", result))
+
+        value = Value()
+        value.unsafe_listen(first)
+        value.unsafe_listen(first)
+        value.unsafe_listen(second)
+        value.unsafe_set(1)
+        self._run()
+        self.assertEqual(sorted(calls), [("first", 1), ("second", 1)])
+
+    def test_unlisten(self):
+        calls = []
+
+        def first(value, result):
+            calls.append(("first", result))
+
+        def second(value, result):
+            calls.append(("second", result))
+
+        value = Value()
+        value.unsafe_listen(first)
+        value.unsafe_unlisten(first)
+        value.unsafe_set(1)
+        self._run()
+        self.assertEqual(calls, [])
+
+        value = Value()
+        value.unsafe_listen(first)
+        value.unsafe_listen(second)
+        value.unsafe_unlisten(first)
+        value.unsafe_set(1)
+        self._run()
+        self.assertEqual(calls, [("second", 1)])
@@ -0,0 +1,35 @@
+import unittest
+
+from ..wheel import Wheel, WheelError
+
+
+class WheelTests(unittest.TestCase):
+    def test_advance_order(self):
+        wheel = Wheel(0.5, 0.0, bits=2, levels=3)
+        for value in [7.3, 0.1, 30.0, 2.2, 2.1, 15.9]:
+            wheel.push(value, value)
+
+        values = []
+        for timestamp in [0.0, 1.0, 2.5, 16.0, 100.0]:
+            values.extend(value for _, value in wheel.advance(timestamp))
+        self.assertEqual(values, [0.1, 2.1, 2.2, 7.3, 15.9, 30.0])
+        self.assertEqual(len(wheel), 0)
+
+    def test_never_early(self):
+        wheel = Wheel(1.0, 0.0)
+        wheel.push(1.5, "a")
+        self.assertEqual(wheel.advance(1.9), [])
+        self.assertEqual([value for _, value in wheel.advance(2.0)], ["a"])
+
+    def test_pop(self):
+        wheel = Wheel(1.0, 0.0)
+        node = wheel.push(5.0, "a")
+        self.assertEqual(wheel.pop(node), "a")
+        self.assertRaises(WheelError, wheel.pop, node)
+        self.assertEqual(wheel.advance(10.0), [])
+
+    def test_horizon(self):
+        wheel = Wheel(1.0, 0.0, bits=2, levels=2)
+        self.assertTrue(wheel.fits(15.0))
+        self.assertFalse(wheel.fits(16.0))
+        self.assertRaises(WheelError, wheel.push, 16.0, "a")
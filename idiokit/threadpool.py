@@ -7,6 +7,16 @@ import collections
 from . import idiokit, timer, _time, _selectloop
 
 
+ThreadPoolStats = collections.namedtuple("ThreadPoolStats", [
+    "threads",
+    "busy",
+    "queued",
+    "completed",
+    "wait_time",
+    "run_time"
+])
+
+
 class ThreadPool(object):
     _Event = idiokit.Event
     _sleep = staticmethod(timer.sleep)
@@ -14,32 +24,69 @@ class ThreadPool(object):
     _Thread = staticmethod(threading.Thread)
     _Lock = staticmethod(threading.Lock)
     _exc_info = staticmethod(sys.exc_info)
-    _asap = staticmethod(_selectloop.asap)
+    _deliver = staticmethod(_selectloop.deliver)
     _monotonic = _time.monotonic
 
-    def __init__(self, idle_time=1.0):
+    def __init__(self, idle_time=1.0, max_threads=None, name=None):
         self.idle_time = idle_time
+        self.max_threads = max_threads
+        self.name = name
         self.supervisor = None
         self.alive = 0
         self.threads = self._deque()
 
-    @idiokit.stream
+        # Calls waiting for a free thread, one FIFO lane per priority.
+        self.lanes = {}
+        self.queued = 0
+
+        self.busy = 0
+        self.completed = 0
+        self.wait_time = 0.0
+        self.run_time = 0.0
+
+    def stats(self):
+        """
+        Return a ThreadPoolStats instance with the current number of
+        threads, busy threads and queued calls, and the number of finished
+        calls with the total time they spent queued and running.
+        """
+
+        return ThreadPoolStats(
+            self.alive,
+            self.busy,
+            self.queued,
+            self.completed,
+            self.wait_time,
+            self.run_time
+        )
+
     def run(self, func, *args, **keys):
+        return self.run_with_priority(0, func, *args, **keys)
+
+    @idiokit.stream
+    def run_with_priority(self, priority, func, *args, **keys):
+        """
+        Like run(...), but when all threads are busy the call waits in the
+        lane of the given priority. Lanes with a lower priority value are
+        served first, and each lane is served in FIFO order.
+        """
+
         event = self._Event()
+        item = event, func, args, keys, self._monotonic()
 
         if self.threads:
             _, lock, queue = self.threads.pop()
-            queue.append((event, func, args, keys))
+            queue.append(item)
             lock.release()
+            self.busy += 1
+        elif self.max_threads is None or self.alive < self.max_threads:
+            self._start(item)
         else:
-            lock = self._Lock()
-            queue = [(event, func, args, keys)]
-
-            thread = self._Thread(target=self._thread, args=(lock, queue))
-            thread.daemon = True
-            thread.start()
-
-            self.alive += 1
+            lane = self.lanes.get(priority, None)
+            if lane is None:
+                lane = self.lanes[priority] = self._deque()
+            lane.append(item)
+            self.queued += 1
 
         if self.supervisor is None:
             self.supervisor = self._supervisor()
@@ -47,11 +94,32 @@ class ThreadPool(object):
         result = yield event
         idiokit.stop(result)
 
+    def _start(self, item):
+        lock = self._Lock()
+        queue = [item]
+
+        thread = self._Thread(target=self._thread, args=(lock, queue))
+        thread.daemon = True
+        thread.start()
+
+        self.alive += 1
+        self.busy += 1
+
+    def _dequeue(self):
+        priority = min(self.lanes)
+        lane = self.lanes[priority]
+
+        item = lane.popleft()
+        if not lane:
+            del self.lanes[priority]
+        self.queued -= 1
+        return item
+
     @idiokit.stream
     def _supervisor(self):
         while True:
             while True:
-                yield self._sleep(self.idle_time / 2.0)
+                yield self._sleep(self.idle_time / 2.0, slack=self.idle_time / 4.0)
                 if self.alive == 0:
                     break
 
@@ -61,39 +129,76 @@ class ThreadPool(object):
                     queue.append(None)
                     lock.release()
 
-            yield self._sleep(self.idle_time)
+            yield self._sleep(self.idle_time, slack=self.idle_time / 4.0)
             if self.alive == 0:
                 self.supervisor = None
                 return
 
-    def _append(self, lock, queue):
-        self.threads.append((self._monotonic(), lock, queue))
+    def _complete(self, lock, queue, wait_time, run_time, event, throw, args):
+        self._append(lock, queue, wait_time, run_time)
+        if throw:
+            event.fail(*args)
+        else:
+            event.succeed(*args)
+
+    def _append(self, lock, queue, wait_time, run_time):
+        self.busy -= 1
+        self.completed += 1
+        self.wait_time += wait_time
+        self.run_time += run_time
+
+        if self.queued:
+            queue.append(self._dequeue())
+            lock.release()
+            self.busy += 1
+        else:
+            self.threads.append((self._monotonic(), lock, queue))
 
     def _finish(self):
         self.alive -= 1
 
     def _thread(self, lock, queue):
+        monotonic = self._monotonic
+
         while True:
             lock.acquire()
 
             item = queue.pop()
             if item is None:
-                self._asap(self._finish)
+                self._deliver(self._finish)
                 return
 
-            event, func, args, keys = item
+            event, func, args, keys, submitted = item
+            start = monotonic()
             try:
                 throw = False
                 args = (func(*args, **keys),)
             except:
                 throw = True
                 args = self._exc_info()
+            end = monotonic()
+
+            # Deliver the thread's return and the result as one call.
+            self._deliver(self._complete, lock, queue, start - submitted, end - start, event, throw, args)
+
+
+_named_pools = {}
+
+
+def named_pool(name, idle_time=1.0, max_threads=None):
+    """
+    Return the ThreadPool with the given name, creating it on the first
+    call. Separate pools keep e.g. slow disk I/O from taking all the
+    threads other blocking calls need. A max_threads value other than
+    None caps the number of threads the pool runs at the same time, and
+    the calls over the cap wait in line. The idle_time and max_threads
+    arguments only matter when the pool gets created.
+    """
 
-            self._asap(self._append, lock, queue)
-            if throw:
-                self._asap(event.fail, *args)
-            else:
-                self._asap(event.succeed, *args)
+    pool = _named_pools.get(name, None)
+    if pool is None:
+        pool = _named_pools[name] = ThreadPool(idle_time, max_threads, name)
+    return pool
 
 
 global_threadpool = ThreadPool()
@@ -3,16 +3,16 @@ from __future__ import absolute_import
 from functools import partial
 
 from . import idiokit
-from ._selectloop import cancel as selectloop_cancel, sleep as selectloop_sleep
+from ._selectloop import cancel as selectloop_cancel, sleep_with_slack as selectloop_sleep
 
 
 def _cancel(node, _, __):
     selectloop_cancel(node)
 
 
-def sleep(delay):
+def sleep(delay, slack=0.0):
     event = idiokit.Event()
-    node = selectloop_sleep(delay, event.succeed)
+    node = selectloop_sleep(delay, slack, event.succeed)
     event.result().listen(partial(_cancel, node))
     return event
 
@@ -21,9 +21,9 @@ class Timeout(Exception):
     pass
 
 
-def timeout(timeout, stream=None, throw=Timeout()):
+def timeout(timeout, stream=None, throw=Timeout(), slack=0.0):
     if stream is None:
         stream = idiokit.Event()
-    node = selectloop_sleep(timeout, stream.throw, throw)
+    node = selectloop_sleep(timeout, slack, stream.throw, throw)
     stream.result().listen(partial(_cancel, node))
     return stream
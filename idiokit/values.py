@@ -12,6 +12,9 @@ def _call(self, listeners, value):
 
 
 class Value(object):
+    # The listeners are stored as None (no listeners), a single callback or,
+    # when there are several listeners, a set of callbacks. Most values only
+    # ever get one listener, so this avoids allocating a set for each.
     __slots__ = "_value", "_listeners"
 
     def __init__(self, value=_UNDEFINED):
@@ -37,26 +40,36 @@ class Value(object):
             return True
         self._listeners = None
 
-        asap(_call, self, listeners, value)
+        if type(listeners) is set:
+            asap(_call, self, listeners, value)
+        else:
+            asap(listeners, self, value)
         return True
 
     def unsafe_listen(self, callback):
         if self._value is _UNDEFINED:
             listeners = self._listeners
             if listeners is None:
-                listeners = set()
-                self._listeners = listeners
-            listeners.add(callback)
+                self._listeners = callback
+            elif type(listeners) is set:
+                listeners.add(callback)
+            elif listeners != callback:
+                self._listeners = set([listeners, callback])
             return
 
         asap(callback, self, self._value)
 
     def unsafe_unlisten(self, callback):
         listeners = self._listeners
-        if listeners is not None:
+        if listeners is None:
+            return
+
+        if type(listeners) is set:
             listeners.discard(callback)
             if not listeners:
                 self._listeners = None
+        elif listeners == callback:
+            self._listeners = None
 
     def set(self, value=None):
         asap(self.unsafe_set, value)
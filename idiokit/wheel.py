@@ -0,0 +1,219 @@
+class WheelError(Exception):
+    pass
+
+
+class Wheel(object):
+    r"""
+    A hierarchical timing wheel: values are pushed with a timestamp and
+    popped in bulk with advance() once their timestamp has passed. Pushing
+    and popping individual nodes cost O(1).
+
+    Timestamps are rounded up to the wheel's resolution, so values never
+    expire early but can expire up to one resolution late.
+
+    >>> wheel = Wheel(1.0, 0.0)
+    >>> node = wheel.push(2.5, "b")
+    >>> _ = wheel.push(1.5, "a")
+    >>> wheel.next_timestamp()
+    2.0
+    >>> [value for _, value in wheel.advance(2.0)]
+    ['a']
+    >>> wheel.pop(node)
+    'b'
+    >>> wheel.advance(10.0)
+    []
+    """
+
+    def __init__(self, resolution, timestamp=0.0, bits=8, levels=4):
+        if resolution <= 0.0:
+            raise ValueError("resolution must be positive")
+
+        self._resolution = float(resolution)
+        self._bits = bits
+        self._size = 1 << bits
+        self._mask = self._size - 1
+        self._horizon = 1 << (bits * levels)
+        self._slots = [[set() for _ in xrange(self._size)] for _ in xrange(levels)]
+        self._counts = [0] * levels
+        self._count = 0
+
+        # The first tick that has not been processed yet, and a cached lower
+        # bound for the next tick that has some work in it (None = unknown).
+        self._tick = self._floor(timestamp)
+        self._next = None
+
+    def _floor(self, timestamp):
+        return int(timestamp // self._resolution)
+
+    def _ceil(self, timestamp):
+        return -int(-timestamp // self._resolution)
+
+    def _place(self, node):
+        tick = self._tick
+        delta = max(node._tick - tick, 0)
+
+        level = 0
+        shift = 0
+        while delta >> shift >= self._size:
+            level += 1
+            shift += self._bits
+
+        target = max(node._tick, tick)
+        if level == 0:
+            due = target
+        else:
+            due = (target >> shift) << shift
+
+        slot = self._slots[level][(target >> shift) & self._mask]
+        slot.add(node)
+        node._slot = slot
+        node._level = level
+        self._counts[level] += 1
+        self._count += 1
+
+        if self._next is not None and due < self._next:
+            self._next = max(due, tick)
+
+    def fits(self, timestamp):
+        """
+        Return True when the timestamp is within the wheel's horizon, i.e.
+        the timestamp can be pushed to the wheel.
+        """
+
+        return self._ceil(timestamp) - self._tick < self._horizon
+
+    def push(self, timestamp, value):
+        tick = self._ceil(timestamp)
+        if tick - self._tick >= self._horizon:
+            raise WheelError("timestamp beyond the wheel's horizon")
+
+        node = _Node(tick, timestamp, value)
+        self._place(node)
+        return node
+
+    def pop(self, node):
+        slot = node._slot
+        if slot is None or node not in slot:
+            raise WheelError("node not in the wheel")
+
+        slot.discard(node)
+        node._slot = None
+        self._counts[node._level] -= 1
+        self._count -= 1
+        return node._value
+
+    def _next_tick(self):
+        if self._next is not None:
+            return self._next
+
+        tick = self._tick
+        best = None
+
+        if self._counts[0]:
+            slots = self._slots[0]
+            for offset in xrange(self._size):
+                if slots[(tick + offset) & self._mask]:
+                    best = tick + offset
+                    break
+
+        shift = 0
+        for level in xrange(1, len(self._slots)):
+            shift += self._bits
+            if not self._counts[level]:
+                continue
+
+            block = tick >> shift
+            if (block << shift) != tick:
+                block += 1
+
+            slots = self._slots[level]
+            for offset in xrange(self._size):
+                if slots[(block + offset) & self._mask]:
+                    due = (block + offset) << shift
+                    if best is None or due < best:
+                        best = due
+                    break
+
+        self._next = best
+        return best
+
+    def next_timestamp(self):
+        """
+        Return the earliest time advance() may have something to return,
+        or None when the wheel is empty.
+        """
+
+        if not self._count:
+            return None
+        return self._next_tick() * self._resolution
+
+    def _cascade(self, level, index):
+        slot = self._slots[level][index]
+        if not slot:
+            return
+
+        self._slots[level][index] = set()
+        self._counts[level] -= len(slot)
+        self._count -= len(slot)
+        for node in slot:
+            self._place(node)
+
+    def advance(self, timestamp):
+        """
+        Remove and return (node, value) pairs for all values whose
+        timestamp is not greater than the given timestamp, ordered by
+        their timestamps.
+        """
+
+        target = self._floor(timestamp)
+        expired = []
+
+        while self._count:
+            tick = self._next_tick()
+            if tick is None or tick > target:
+                break
+            self._tick = tick
+
+            shift = self._bits * (len(self._slots) - 1)
+            for level in xrange(len(self._slots) - 1, 0, -1):
+                if tick & ((1 << shift) - 1) == 0:
+                    self._cascade(level, (tick >> shift) & self._mask)
+                shift -= self._bits
+
+            index = tick & self._mask
+            slot = self._slots[0][index]
+            if slot:
+                self._slots[0][index] = set()
+                self._counts[0] -= len(slot)
+                self._count -= len(slot)
+                for node in slot:
+                    node._slot = None
+                    expired.append(node)
+
+            self._tick = tick + 1
+            self._next = None
+
+        if self._tick <= target:
+            self._tick = target + 1
+            self._next = None
+
+        expired.sort(key=_timestamp)
+        return [(node, node._value) for node in expired]
+
+    def __len__(self):
+        return self._count
+
+
+def _timestamp(node):
+    return node._timestamp
+
+
+class _Node(object):
+    __slots__ = "_tick", "_timestamp", "_value", "_slot", "_level"
+
+    def __init__(self, tick, timestamp, value):
+        self._tick = tick
+        self._timestamp = timestamp
+        self._value = value
+        self._slot = None
+        self._level = None
@@ -14,11 +14,11 @@ class Restart(Exception):
 
 @idiokit.stream
 def throw(exception):
-    yield timer.sleep(0.0)
+    yield idiokit.finished()
     raise exception
 
 
-def element_stream(sock, domain, timeout, ws_ping_interval=10.0):
+def element_stream(sock, domain, timeout, ws_ping_interval=10.0, max_buffered=None):
     @idiokit.stream
     def write():
         stream_element = xmlcore.Element("stream:stream")
@@ -30,7 +30,7 @@ def element_stream(sock, domain, timeout, ws_ping_interval=10.0):
 
         while True:
             try:
-                element = yield timer.timeout(ws_ping_interval, idiokit.next())
+                element = yield timer.timeout(ws_ping_interval, idiokit.next(), slack=ws_ping_interval / 10.0)
             except timer.Timeout:
                 # Send a whitespace heartbeat when no XML output data has
                 # appeared after ws_ping_interval seconds of waiting.
@@ -55,7 +55,12 @@ def element_stream(sock, domain, timeout, ws_ping_interval=10.0):
         except Restart:
             pass
 
-    return idiokit.pipe(write(), read())
+    if max_buffered is None:
+        return idiokit.pipe(write(), read())
+
+    # Keep reading and parsing while the consumer is busy with the
+    # previous elements, up to max_buffered elements.
+    return idiokit.pipe(write(), read(), idiokit.buffer(max_buffered))
 
 
 @idiokit.stream